@@ -1,17 +1,24 @@
 import stddraw  # the stddraw module is used as a basic graphics library
-import random  # used for creating tetrominoes with random types/shapes
-from game_grid import GameGrid  # class for modeling the game grid
-from tetromino import Tetromino  # class for modeling the tetrominoes
+from engine import GameEngine  # runs the game rules (headless)
+from replay import start_recording  # used for recording the game
+from autoplay import BeamSearchAgent  # the bot of the autoplay mode
+from frame_timing import FrameTimings  # used for timing the frames
 from picture import Picture  # used representing images to display
 import os  # used for file and directory operations
-import numpy as np
+import argparse  # used for parsing the command-line arguments
+import time  # used for timing the game loop
 from color import Color  # used for coloring the game menu
 
 
 
 
 
-def start():
+# Starts the game, which is played by the beam search bot of autoplay.py instead
+# of the keyboard when autoplay is True. When profile is the path of a file, the
+# time spent in each phase of each frame is measured (see frame_timing.py),
+# exported to the file (CSV if its name ends with .csv, JSON lines otherwise)
+# and summarized when the game is over.
+def start(autoplay=False, profile=None):
     # set the dimensions of the game grid
     grid_h, grid_w = 20, 12
     # set the size of the drawing canvas
@@ -21,103 +28,99 @@ def start():
     stddraw.setXscale(-0.5, grid_w + 3)
     stddraw.setYscale(-0.5, grid_h - 0.5)
 
-    # create the game grid
-    grid = GameGrid(grid_h, grid_w)
-    # create the first tetromino to enter the game grid
-    # by using the create_tetromino function defined below
-    current_tetromino = create_tetromino(grid_h, grid_w)
-    grid.current_tetromino = current_tetromino
-
+    # the game rules are run in fixed simulation ticks, the tetromino is moved
+    # down once every gravity_interval seconds and the grid is drawn at most
+    # max_fps times per second
+    tick_duration = 1 / 60
+    gravity_interval = 0.243
+    max_fps = 60
+    # simulation time that can be caught up at once (e.g. after the window has
+    # been dragged), the rest is skipped instead of running many ticks in a row
+    max_lag = 0.25
+
+    # create the game engine that runs the game rules on the game grid and
+    # creates the first tetromino to enter the game grid
+    engine = GameEngine(grid_h, grid_w, round(gravity_interval / tick_duration))
+    grid = engine.grid
+    # record the game, its replay is saved when the game is over
+    recorder = start_recording(engine)
+    if autoplay:
+        # the bot places each tetromino once it has been shown for a gravity
+        # interval, all the moves of a placement are applied in a single tick
+        agent = BeamSearchAgent()
+        autoplay_tetromino, autoplay_ticks = None, 0
 
     # display a simple menu before opening the game
     display_game_menu(grid_h, grid_w)
 
-    # initial score
-    score = 0
-    speed = 243 #initial speed
+    # time the phases of the frames only when asked to, the game loop runs the
+    # original functions otherwise
+    timings = None
+    if profile is not None:
+        timings = FrameTimings()
+        timings.instrument(engine, stddraw)
 
     # main game loop (keyboard interaction for moving the tetromino)
-    while True:
-        # check user interactions via the keyboard
-        if stddraw.hasNextKeyTyped():
-            key_typed = stddraw.nextKeyTyped()
-            # if the left arrow key has been pressed
-            if key_typed == "left":
-                # move the tetromino left by one
-                current_tetromino.move(key_typed, grid)
-            # if the right arrow key has been pressed
-            elif key_typed == "right":
-                # move the tetromino right by one
-                current_tetromino.move(key_typed, grid)
-            # if the down arrow key has been pressed
-            elif key_typed == "down":
-                # move the tetromino down by one
-                # (causes the tetromino to fall down faster)
-                current_tetromino.move(key_typed, grid)
-            elif key_typed == "up":
-                # rotate the tetromino
-                current_tetromino.rotateTetromino()
-            elif key_typed == "space":
-                # drop the tetromino
-                for i in range(grid_h):
-                 current_tetromino.move("down",grid)
-
-            # clear the queue that stores all the keys pressed/typed
-            stddraw.clearKeysTyped()
-
-        # move (drop) the tetromino down by 1 at each iteration
-        success = current_tetromino.move("down", grid)
-        grid.connected_4_neighbor()
-
-
-        if not success:
-
-            tiles = current_tetromino.tile_matrix
-
-            game_over = grid.update_grid(tiles)
-
-            rows_score = 0
-            tiles_score = 0
-
-
-            for i in range(grid_h):
-                grid.merging(grid.tile_matrix)
-
-                ind_score = grid.update_score(grid.tile_num2)
-                if grid.is_full(i, grid.tile_matrix):
-
-                    rows_score = grid.update_score(grid.tile_num)
-            grid.tile_num2 = np.zeros(100)
-            score_val = tiles_score + rows_score
-            score += int(score_val)
-
-
-
-            if game_over:
-                break
-
-
-
-            current_tetromino = create_tetromino(grid_h, grid_w)
-            grid.current_tetromino = current_tetromino
-
-
-        grid.display(score,speed)
-
-
+    previous_time = time.monotonic()
+    next_frame_time = previous_time
+    lag = 0.0
+    while not engine.game_over:
+        current_time = time.monotonic()
+        lag = min(lag + current_time - previous_time, max_lag)
+        previous_time = current_time
+
+        # run the simulation ticks that are due
+        while lag >= tick_duration and not engine.game_over:
+            # apply all the keys typed since the last tick (left, right, down,
+            # up = rotate, space = drop), the other keys are ignored, the
+            # tetromino is moved down by gravity
+            stddraw.pollEvents()
+            keys_typed = [key for event_time, kind, key in stddraw.nextEvents()
+                          if kind == 'key' and key in GameEngine.actions]
+            if autoplay:
+                if engine.current_tetromino is not autoplay_tetromino:
+                    autoplay_tetromino, autoplay_ticks = engine.current_tetromino, 0
+                autoplay_ticks += 1
+                keys_typed = []
+                if autoplay_ticks == engine.gravity_ticks:
+                    keys_typed = agent(engine)
+            engine.tick(keys_typed)
+            lag -= tick_duration
+        if engine.game_over:
+            break
+
+        # draw the game grid if the next frame is due
+        if current_time >= next_frame_time:
+            grid.display(engine.score, 0)
+            next_frame_time = max(next_frame_time + 1 / max_fps, current_time)
+            if timings is not None:
+                timings.end_frame()
+
+        # sleep until the next tick or frame is due
+        sleep_time = min(tick_duration - lag, next_frame_time - time.monotonic())
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+    save_replay(recorder)
+    if timings is not None:
+        timings.restore()
+        timings.export(profile)
+        print(timings.report())
+    if autoplay:
+        print("Autoplay: score %d, %.0f nodes/s" % (engine.score,
+                                                    agent.nodes_per_second()))
     finish_game(grid_h, grid_w)
     print("Game over")
 
 
-
-def create_tetromino(grid_height, grid_width):
-
-    tetromino_types = ['I', 'O', 'Z', 'L', 'J', 'S', 'T']
-    random_index = random.randint(0, len(tetromino_types) - 1)
-    random_type = tetromino_types[random_index]
-
-    tetromino = Tetromino(random_type, grid_height, grid_width)
-    return tetromino
+# Saves the replay of a game in the replays directory next to this file, the
+# saved replay can be played again with replay.play_replay
+def save_replay(recorder):
+    current_dir = os.path.dirname(os.path.realpath(__file__))
+    replay_dir = os.path.join(current_dir, "replays")
+    os.makedirs(replay_dir, exist_ok=True)
+    file_name = time.strftime("%Y%m%d-%H%M%S") + ".replay"
+    recorder.save(os.path.join(replay_dir, file_name))
 
 
 def finish_game(grid_height, grid_width):
@@ -181,4 +184,11 @@ def display_game_menu(grid_height, grid_width):
 
 
 if __name__ == '__main__':
-    start()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play Tetris 2048.")
+    parser.add_argument("--autoplay", action="store_true",
+                        help="let the beam search bot play the game")
+    parser.add_argument("--profile", default=None, metavar="FILE",
+                        help="export the time of each phase of each frame to "
+                             "FILE (.csv or JSON lines)")
+    args = parser.parse_args()
+    start(autoplay=args.autoplay, profile=args.profile)
\ No newline at end of file
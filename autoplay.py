@@ -0,0 +1,169 @@
+import argparse  # used for parsing the command-line arguments
+import time  # used for measuring the search speed
+import numpy as np  # fundamental Python module for scientific computing
+from engine import GameEngine  # runs the game rules (headless)
+from grid_kernels import number_to_exponent, settle_board  # game rules on boards
+from grid_kernels import column_heights  # skyline of the boards
+from placements import find_placements  # placements of the tetrominoes
+from zobrist import TranspositionTable, update_zobrist_hash  # duplicate boards
+
+# A bot that plays Tetris 2048 with a beam search: for the current tetromino and
+# the next ones (lookahead), every reachable placement (see placements.py) is
+# simulated on the board (lock, merge, clear and float-drop, see
+# grid_kernels.settle_board), the resulting boards are scored with an evaluation
+# function and the best beam_width lines of placements are kept at each level.
+# Lines that reach the same board after the same number of pieces have the same
+# future, so only the one with the best score is kept (the boards are found by
+# their Zobrist hashes in a transposition table, see zobrist.py).
+# The bot is used headless (python autoplay.py, or the "beam" agent of
+# tournament.py) or in the autoplay mode of the interactive game (see start in
+# Tetris_2048.py).
+
+
+# Evaluation function used by default: the score of the placements plus
+# penalties for the height of the stack, the holes (empty cells under a tile),
+# the bumpiness (height differences between neighbor columns) and a bonus for
+# the horizontal pairs of equal tiles (which can be merged later)
+def default_evaluation(values, score):
+    occupied = values != 0
+    top = column_heights(values)
+    holes = int(top.sum() - occupied.sum())
+    bumpiness = int(np.abs(np.diff(top)).sum())
+    pairs = int(((values[:, 1:] == values[:, :-1]) & occupied[:, 1:]).sum())
+    return score - 4.0 * int(top.sum()) / len(top) - 2.0 * int(top.max()) \
+        - 8.0 * holes - 1.0 * bumpiness + 0.5 * pairs
+
+
+# Class used for giving a board (an array of tile exponents) the attributes of a
+# GameGrid used by find_placements
+class BoardView:
+    def __init__(self, values):
+        self.values = values
+        self.grid_height, self.grid_width = values.shape
+        # pack the occupied cells of each row into an int, bit 0 = column 0
+        packed = np.packbits(values != 0, axis=1, bitorder="little")
+        self.row_masks = [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+# Class used for choosing the placements of the tetrominoes with a beam search
+class BeamSearchAgent:
+    # Constructor that sets the parameters of the search: the number of lines
+    # kept at each level (beam_width), the number of tetrominoes placed in each
+    # line (lookahead, the current one and the next ones) and the evaluation
+    # function called with the board and the score of a line
+    def __init__(self, beam_width=4, lookahead=2, evaluate=default_evaluation,
+                 table_size=1 << 14):
+        self.beam_width = beam_width
+        self.lookahead = lookahead
+        self.evaluate = evaluate
+        # boards met in the searches with the best score of the lines reaching
+        # them, and the number of searches so far
+        self.table = TranspositionTable(table_size)
+        self.searches = 0
+        # number of boards evaluated, of duplicate lines skipped and time spent
+        # searching
+        self.nodes = 0
+        self.duplicates = 0
+        self.search_seconds = 0.0
+
+    # Method for getting the number of boards evaluated per second of search
+    def nodes_per_second(self):
+        if self.search_seconds == 0:
+            return 0.0
+        return self.nodes / self.search_seconds
+
+    # Method for finding the best placement of the current tetromino of a game,
+    # returns the placement (see placements.Placement) or None when no placement
+    # is possible
+    def search(self, engine):
+        start_time = time.perf_counter()
+        self.searches += 1
+        pieces = [engine.current_tetromino] + engine.upcoming(self.lookahead - 1)
+        # each line is (value, board, hash of the board, score, first placement)
+        beam = [(0.0, engine.grid.value_matrix, engine.grid.zobrist_hash, 0, None)]
+        for piece, tetromino in enumerate(pieces):
+            lines = []
+            for value, values, board_hash, score, first in beam:
+                for placement in find_placements(BoardView(values), tetromino):
+                    # a placement with tiles above the grid ends the game
+                    if any(row >= engine.grid_height for col, row, number
+                           in placement.cells):
+                        continue
+                    new_values = values.copy()
+                    for col, row, number in placement.cells:
+                        new_values[row, col] = number_to_exponent(number)
+                    new_values, gained = settle_board(new_values)
+                    new_score = score + gained
+                    new_hash = update_zobrist_hash(board_hash, values, new_values)
+                    # keep a single line (the one with the best score) for the
+                    # lines of this level reaching the same board, the value of
+                    # the table entry is the index of the line
+                    entry = self.table.get(new_hash)
+                    duplicate = entry is not None and \
+                        entry[:2] == (self.searches, piece)
+                    if duplicate:
+                        self.duplicates += 1
+                        if lines[entry[2]][3] >= new_score:
+                            continue
+                    line = (self.evaluate(new_values, new_score), new_values,
+                            new_hash, new_score, first or placement)
+                    if duplicate:
+                        lines[entry[2]] = line
+                    else:
+                        self.table.store(new_hash, self.searches, piece, len(lines))
+                        lines.append(line)
+            self.nodes += len(lines)
+            if not lines:
+                break
+            lines.sort(key=lambda line: line[0], reverse=True)
+            beam = lines[:self.beam_width]
+        self.search_seconds += time.perf_counter() - start_time
+        return beam[0][4]
+
+    # Method for choosing the actions of a step, to be used as the choose_action
+    # function of GameEngine.run: all the moves to the best placement of a new
+    # tetromino followed by a hard drop are returned together (they are applied
+    # in a single tick, see placements.find_placements)
+    def __call__(self, engine):
+        placement = self.search(engine)
+        if placement is None:
+            return "space"
+        return placement.path + ["space"]
+
+
+# Agent factory of the beam search agent for tournament.py
+def beam_agent(seed):
+    return BeamSearchAgent()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Play Tetris 2048 headless with the beam search bot.")
+    parser.add_argument("--games", type=int, default=1, help="number of games")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game (the next games use the next seeds)")
+    parser.add_argument("--beam-width", type=int, default=4,
+                        help="number of lines kept at each level")
+    parser.add_argument("--lookahead", type=int, default=2,
+                        help="number of tetrominoes placed in each line")
+    parser.add_argument("--max-pieces", type=int, default=None,
+                        help="maximum number of pieces placed in a game")
+    args = parser.parse_args(argv)
+    for game in range(args.games):
+        agent = BeamSearchAgent(args.beam_width, args.lookahead)
+        engine = GameEngine(seed=args.seed + game)
+        start_time = time.perf_counter()
+        while not engine.game_over:
+            if args.max_pieces is not None and engine.pieces_placed >= args.max_pieces:
+                break
+            engine.step(agent(engine))
+        elapsed = time.perf_counter() - start_time
+        print("game %d: score %d, max tile %d, %d pieces in %.1f s, %d nodes "
+              "(%.0f nodes/s), %d duplicates skipped" % (
+                  game, engine.score, engine.max_tile, engine.pieces_placed,
+                  elapsed, agent.nodes, agent.nodes_per_second(),
+                  agent.duplicates))
+
+
+if __name__ == '__main__':
+    main()
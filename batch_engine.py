@@ -0,0 +1,189 @@
+import numpy as np  # fundamental Python module for scientific computing
+from tetromino import ROTATIONS, MATRIX_SIZES, KICKS  # tetromino shapes
+from grid_kernels import merge_all_batch, clear_full_rows  # merging, full rows
+from grid_kernels import find_supported_batch, drop_floating  # floating tiles
+from grid_kernels import exponents_to_numbers
+
+
+# Tetromino types in the order of their indices in the arrays below
+TYPES = ('I', 'O', 'Z', 'L', 'J', 'S', 'T')
+# OFFSETS[type, rotation, tile] = (dx, dy) offset of the tile from the bottom left
+# corner of the tetromino (see tetromino.ROTATIONS)
+OFFSETS = np.array([ROTATIONS[type] for type in TYPES], dtype=np.int64)
+# size of the tile matrix of each tetromino type
+SIZES = np.array([MATRIX_SIZES[type] for type in TYPES], dtype=np.int64)
+# actions that can be applied to the current tetrominoes, an action is given to
+# step as its index in this tuple (0 = no action)
+ACTIONS = (None, "left", "right", "down", "up", "space")
+
+
+# Class used for simulating a batch of games in lockstep, with the boards of all
+# the games stored in a single array of tile exponents of shape (b, h, w) (see
+# grid_kernels) and the current tetrominoes stored as arrays of their types,
+# rotations, positions and tile exponents. The game rules are the same as the
+# ones of GameEngine and GameGrid, but each step applies them to all the games
+# at once with vectorized operations.
+class BatchEngine:
+    # Constructor that creates batch_size empty boards and spawns the first
+    # tetromino of each game, seed is used for the random tetrominoes
+    def __init__(self, batch_size, grid_h=20, grid_w=12, seed=None):
+        self.batch_size = batch_size
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.rng = np.random.default_rng(seed)
+        # boards of the games
+        self.values = np.zeros((batch_size, grid_h, grid_w), dtype=np.uint8)
+        # current tetromino of each game
+        self.types = np.zeros(batch_size, dtype=np.int64)
+        self.rotations = np.zeros(batch_size, dtype=np.int64)
+        self.xs = np.zeros(batch_size, dtype=np.int64)
+        self.ys = np.zeros(batch_size, dtype=np.int64)
+        self.exponents = np.zeros((batch_size, 4), dtype=np.uint8)
+        # game state
+        self.scores = np.zeros(batch_size, dtype=np.int64)
+        self.pieces_placed = np.zeros(batch_size, dtype=np.int64)
+        self.game_over = np.zeros(batch_size, dtype=bool)
+        # create the first tetromino of each game
+        self.spawn(np.arange(batch_size))
+
+    # Method for creating new tetrominoes above the grid in the given games
+    def spawn(self, games):
+        n = len(games)
+        types = self.rng.integers(0, len(TYPES), n)
+        self.types[games] = types
+        self.rotations[games] = 0
+        # a random horizontal position and a 2 or a 4 on each tile
+        self.xs[games] = self.rng.integers(0, self.grid_width - SIZES[types] + 1)
+        self.ys[games] = self.grid_height
+        self.exponents[games] = self.rng.integers(1, 3, (n, 4))
+
+    # Method for getting the columns and the rows of the tiles of the current
+    # tetrominoes of the given games if they had the given rotations and
+    # positions, as two arrays of shape (len(games), 4)
+    def tile_positions(self, games, rotations, xs, ys):
+        offsets = OFFSETS[self.types[games], rotations]
+        return xs[:, np.newaxis] + offsets[..., 0], ys[:, np.newaxis] + offsets[..., 1]
+
+    # Method to check if the current tetrominoes of the given games fit on their
+    # grids with the given rotations and positions (cells above the grid are
+    # always free), as GameGrid.can_place does for a single game
+    def can_place(self, games, rotations, xs, ys):
+        cols, rows = self.tile_positions(games, rotations, xs, ys)
+        inside = ((cols >= 0) & (cols < self.grid_width) & (rows >= 0)).all(axis=1)
+        on_grid = rows < self.grid_height
+        occupied = self.values[games[:, np.newaxis],
+                               np.clip(rows, 0, self.grid_height - 1),
+                               np.clip(cols, 0, self.grid_width - 1)] != 0
+        return inside & ~(occupied & on_grid).any(axis=1)
+
+    # Method for moving the current tetrominoes of the given games by (dx, dy)
+    # where they fit, returns a boolean array of the moved tetrominoes
+    def move(self, games, dx, dy):
+        xs, ys = self.xs[games] + dx, self.ys[games] + dy
+        moved = self.can_place(games, self.rotations[games], xs, ys)
+        self.xs[games[moved]] = xs[moved]
+        self.ys[games[moved]] = ys[moved]
+        return moved
+
+    # Method for rotating the current tetrominoes of the given games clockwise
+    # with the same wall kicks as Tetromino.rotateTetromino
+    def rotate(self, games):
+        rotations = (self.rotations[games] + 1) % 4
+        rotated = np.zeros(len(games), dtype=bool)
+        for dx, dy in KICKS:
+            left = ~rotated
+            xs, ys = self.xs[games] + dx, self.ys[games] + dy
+            fits = left & self.can_place(games, rotations, xs, ys)
+            kicked = games[fits]
+            self.rotations[kicked] = rotations[fits]
+            self.xs[kicked] = xs[fits]
+            self.ys[kicked] = ys[fits]
+            rotated |= fits
+        return rotated
+
+    # Method for dropping the current tetrominoes of the given games as far as
+    # they can go (at most grid_height rows, as GameEngine.hard_drop)
+    def hard_drop(self, games):
+        for i in range(self.grid_height):
+            if len(games) == 0:
+                break
+            games = games[self.move(games, 0, -1)]
+
+    # Method for applying one action per game (indices in ACTIONS, 0 for no
+    # action) followed by one gravity step, as GameEngine.step does for a single
+    # game. The games that are over are not changed.
+    # Returns a boolean array of the games whose tetromino has been locked
+    def step(self, actions=None):
+        active = ~self.game_over
+        if actions is not None:
+            actions = np.asarray(actions)
+            for code in range(1, len(ACTIONS)):
+                games = np.flatnonzero(active & (actions == code))
+                if len(games) == 0:
+                    continue
+                action = ACTIONS[code]
+                if action == "left":
+                    self.move(games, -1, 0)
+                elif action == "right":
+                    self.move(games, 1, 0)
+                elif action == "down":
+                    self.move(games, 0, -1)
+                elif action == "up":
+                    self.rotate(games)
+                else:  # action == "space"
+                    self.hard_drop(games)
+        # move (drop) the tetrominoes down by 1 and lock the ones that cannot move
+        games = np.flatnonzero(active)
+        blocked = games[~self.move(games, 0, -1)]
+        locked = np.zeros(self.batch_size, dtype=bool)
+        if len(blocked) > 0:
+            self.lock(blocked)
+            locked[blocked] = True
+        return locked
+
+    # Method for placing the current tetrominoes of the given games on their
+    # grids, then merging the tiles, clearing the full rows, updating the scores
+    # and dropping the floating tiles, as GameEngine.lock does for a single game
+    def lock(self, games):
+        cols, rows = self.tile_positions(games, self.rotations[games],
+                                         self.xs[games], self.ys[games])
+        # the game is over when a tile is locked above the grid
+        outside = rows >= self.grid_height
+        self.game_over[games] = outside.any(axis=1)
+        inside = ~outside
+        index = np.broadcast_to(games[:, np.newaxis], rows.shape)
+        self.values[index[inside], rows[inside], cols[inside]] = self.exponents[games][inside]
+        self.pieces_placed[games] += 1
+
+        values = self.values[games]
+        scores = np.zeros(len(games), dtype=np.int64)
+        # merge the tiles, then clear all the full rows at once and merge again
+        # as long as the merges make new rows full
+        values = merge_all_batch(values)
+        cleared, full = clear_full_rows(values)
+        while full.any():
+            # the tiles of the cleared rows are added to the scores
+            numbers = exponents_to_numbers(values) * full[..., np.newaxis]
+            scores += numbers.sum(axis=(1, 2))
+            values = merge_all_batch(cleared)
+            cleared, full = clear_full_rows(values)
+        # drop the tiles left floating by the merges and the cleared rows
+        values = drop_floating(values, find_supported_batch(values))
+        self.values[games] = values
+        self.scores[games] += scores
+
+        # spawn the next tetrominoes of the games that are not over
+        self.spawn(games[~self.game_over[games]])
+
+    # Method for playing until all the games are over or max_steps steps have
+    # been taken, choose_actions is called with the engine before each step and
+    # returns the action of each game (see step)
+    def run(self, choose_actions=None, max_steps=None):
+        steps = 0
+        while not self.game_over.all():
+            if max_steps is not None and steps >= max_steps:
+                break
+            actions = choose_actions(self) if choose_actions is not None else None
+            self.step(actions)
+            steps += 1
+        return self.scores
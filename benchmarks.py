@@ -0,0 +1,269 @@
+import argparse  # used for parsing the command-line arguments
+import json  # used for printing the results
+import os  # used for selecting the offscreen video driver
+import platform  # used for describing the machine in the results
+import random  # used for creating the tetrominoes
+import sys
+import time  # used for timing the operations
+import numpy as np  # fundamental Python module for scientific computing
+from game_grid import GameGrid, connected_component_labeling
+from tetromino import Tetromino
+
+# Microbenchmarks of the hot functions of the game on a fixed set of boards
+# (fixtures). Each operation is timed on its own (the preparation of the grid
+# before an operation is not timed) and the results are printed as JSON: the
+# operations per second and the percentiles of the time of an operation of each
+# benchmark on each fixture, with a description of the machine, so that runs on
+# different machines or before and after a change can be compared. Example:
+#
+#    python benchmarks.py --output before.json
+#    python benchmarks.py --bench merging,display --fixture half_full
+
+# the grid is drawn on an offscreen surface unless another video driver is set
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+GRID_H, GRID_W = 20, 12
+# percentiles reported for the time of an operation
+PERCENTILES = (50, 90, 99)
+
+
+# Returns the boards of the fixtures (arrays of tile exponents, see GameGrid),
+# created from a fixed seed so that they are the same in every run
+def make_fixtures(grid_h=GRID_H, grid_w=GRID_W):
+    rng = np.random.default_rng(2048)
+
+    # rows of random tiles (2 to 64) with one empty cell in each row, so that
+    # no row is full
+    def rows(n):
+        values = rng.integers(1, 7, (n, grid_w)).astype(np.uint8)
+        values[np.arange(n), rng.integers(0, grid_w, n)] = 0
+        return values
+
+    empty = np.zeros((grid_h, grid_w), dtype=np.uint8)
+    half_full = empty.copy()
+    half_full[:grid_h // 2] = rows(grid_h // 2)
+    near_top_out = empty.copy()
+    near_top_out[:grid_h - 2] = rows(grid_h - 2)
+    # full rows of alternating 2 and 4 tiles, no tile can be merged
+    checkerboard = (np.indices((grid_h, grid_w)).sum(axis=0) % 2 + 1).astype(np.uint8)
+    return {"empty": empty, "half_full": half_full, "near_top_out": near_top_out,
+            "checkerboard": checkerboard}
+
+
+# Times op (called without arguments) on its own until it has been called at
+# least min_ops times and for at least min_time seconds (at most max_ops times),
+# setup is called before each call without being timed.
+# Returns the times of the calls in seconds as an array
+def measure(op, setup=None, min_time=0.2, min_ops=20, max_ops=100000):
+    timer = time.perf_counter
+    # warm up the caches
+    for i in range(3):
+        if setup is not None:
+            setup()
+        op()
+    times = []
+    total = 0.0
+    while len(times) < max_ops and (len(times) < min_ops or total < min_time):
+        if setup is not None:
+            setup()
+        start_time = timer()
+        op()
+        elapsed = timer() - start_time
+        times.append(elapsed)
+        total += elapsed
+    return np.array(times)
+
+
+# Returns the statistics of the times of an operation
+def summarize_times(times):
+    stats = {"ops": len(times), "ops_per_second": len(times) / times.sum(),
+             "mean_us": times.mean() * 1e6, "min_us": times.min() * 1e6}
+    for percentile, value in zip(PERCENTILES, np.percentile(times, PERCENTILES)):
+        stats["p%d_us" % percentile] = value * 1e6
+    return stats
+
+
+# Creates a grid with the tiles of a fixture and a tetromino at the top of it
+def make_grid(values):
+    grid_h, grid_w = values.shape
+    grid = GameGrid(grid_h, grid_w)
+    grid.set_values(values.copy())
+    tetromino = Tetromino("T", grid_h, grid_w, rng=random.Random(0))
+    tetromino.bottom_left_corner.x = grid_w // 2 - 1
+    tetromino.bottom_left_corner.y = grid_h - 2
+    tetromino.update_tile_positions()
+    grid.current_tetromino = tetromino
+    return grid
+
+
+# Benchmarks of the operations on a fixture: each function gets the board of the
+# fixture and returns the operation to time and the setup called before it
+
+def bench_merging(values):
+    grid = make_grid(values)
+    return grid.merging, lambda: grid.set_values(values.copy())
+
+
+def bench_is_full(values):
+    grid = make_grid(values)
+    return lambda: grid.is_full(0), None
+
+
+def bench_connected_4_neighbor(values):
+    grid = make_grid(values)
+    return grid.connected_4_neighbor, lambda: grid.set_values(values.copy())
+
+
+def bench_connected_component_labeling(values):
+    binary_matrix = values != 0
+    return lambda: connected_component_labeling(binary_matrix), None
+
+
+def bench_can_be_moved(values):
+    grid = make_grid(values)
+    tetromino = grid.current_tetromino
+    return lambda: tetromino.can_be_moved("down", grid), None
+
+
+def bench_rotate_tetromino(values):
+    grid = make_grid(values)
+    tetromino = grid.current_tetromino
+    return lambda: tetromino.rotateTetromino(grid), None
+
+
+# Drawing the whole canvas (as for the first frame)
+def bench_display(values):
+    setup_canvas(values.shape)
+    grid = make_grid(values)
+    return lambda: grid.display(0, 0), grid.invalidate_display
+
+
+# Drawing a frame after the tetromino has moved by one cell (only the changed
+# cells are drawn)
+def bench_display_move(values):
+    setup_canvas(values.shape)
+    grid = make_grid(values)
+    grid.display(0, 0)
+    tetromino = grid.current_tetromino
+    directions = ["left", "right"]
+
+    def move():
+        if not tetromino.move(directions[0], grid):
+            directions.reverse()
+            tetromino.move(directions[0], grid)
+    return lambda: grid.display(0, 0), move
+
+
+# Benchmarks that do not depend on the board, run once
+
+def bench_tetromino_init():
+    rng = random.Random(0)
+    types = ['I', 'O', 'Z', 'L', 'J', 'S', 'T']
+    index = [0]
+
+    def create():
+        index[0] = (index[0] + 1) % len(types)
+        Tetromino(types[index[0]], GRID_H, GRID_W, rng=rng)
+    return create, None
+
+
+BOARD_BENCHMARKS = {
+    "merging": bench_merging,
+    "is_full": bench_is_full,
+    "connected_4_neighbor": bench_connected_4_neighbor,
+    "connected_component_labeling": bench_connected_component_labeling,
+    "can_be_moved": bench_can_be_moved,
+    "rotate_tetromino": bench_rotate_tetromino,
+    "display": bench_display,
+    "display_move": bench_display_move,
+}
+OTHER_BENCHMARKS = {
+    "tetromino_init": bench_tetromino_init,
+}
+
+
+# size of the canvas set up for the display benchmarks (the canvas of stddraw
+# can be set up only once)
+_canvas_shape = None
+
+
+# Sets the canvas of stddraw up as the game does (see start in Tetris_2048.py)
+def setup_canvas(shape):
+    global _canvas_shape
+    import stddraw
+    if _canvas_shape is not None:
+        if _canvas_shape != shape:
+            raise ValueError("the canvas is already set up for another grid size")
+        return
+    _canvas_shape = shape
+    grid_h, grid_w = shape
+    stddraw.setCanvasSize(40 * grid_w + 100, 40 * grid_h)
+    stddraw.setXscale(-0.5, grid_w + 3)
+    stddraw.setYscale(-0.5, grid_h - 0.5)
+
+
+# Runs the given benchmarks on the given fixtures, returns the results as a
+# dictionary
+def run_benchmarks(bench_names, fixture_names, min_time=0.2):
+    fixtures = make_fixtures()
+    results = []
+    for name in bench_names:
+        if name in OTHER_BENCHMARKS:
+            runs = [(None, OTHER_BENCHMARKS[name]())]
+        else:
+            runs = [(fixture, BOARD_BENCHMARKS[name](fixtures[fixture]))
+                    for fixture in fixture_names]
+        for fixture, (op, setup) in runs:
+            result = {"benchmark": name, "fixture": fixture}
+            result.update(summarize_times(measure(op, setup, min_time)))
+            results.append(result)
+    return {"machine": {"python": platform.python_version(),
+                        "implementation": platform.python_implementation(),
+                        "numpy": np.__version__, "system": platform.system(),
+                        "processor": platform.processor() or platform.machine(),
+                        "cpus": os.cpu_count()},
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "min_time": min_time, "results": results}
+
+
+def main(argv=None):
+    all_benchmarks = list(BOARD_BENCHMARKS) + list(OTHER_BENCHMARKS)
+    fixture_names = list(make_fixtures())
+    parser = argparse.ArgumentParser(
+        description="Time the hot functions of the game on fixed boards.")
+    parser.add_argument("--bench", default=",".join(all_benchmarks),
+                        help="comma-separated benchmarks (default: all of %s)"
+                             % ", ".join(all_benchmarks))
+    parser.add_argument("--fixture", default=",".join(fixture_names),
+                        help="comma-separated fixtures (default: all of %s)"
+                             % ", ".join(fixture_names))
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimum time spent timing each benchmark (seconds)")
+    parser.add_argument("--output", default=None,
+                        help="file the results are written to (default: stdout)")
+    args = parser.parse_args(argv)
+    bench_names = [name for name in args.bench.split(",") if name]
+    fixtures = [name for name in args.fixture.split(",") if name]
+    for name in bench_names:
+        if name not in all_benchmarks:
+            parser.error("unknown benchmark: " + name)
+    for name in fixtures:
+        if name not in fixture_names:
+            parser.error("unknown fixture: " + name)
+
+    report = run_benchmarks(bench_names, fixtures, args.min_time)
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    for result in report["results"]:
+        print("%-30s %-14s %12.0f ops/s  p50 %9.1f us  p99 %9.1f us" % (
+            result["benchmark"], result["fixture"] or "-",
+            result["ops_per_second"], result["p50_us"], result["p99_us"]),
+            file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
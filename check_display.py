@@ -0,0 +1,68 @@
+import argparse  # used for parsing the command-line arguments
+import os  # used for selecting the offscreen video driver
+import random  # used for choosing the actions of the games
+import sys
+from engine import GameEngine  # runs the game rules (headless)
+
+# Regression check of the incremental drawing of the game grid (see
+# GameGrid.display): seeded games are played with random actions on an
+# offscreen window and after each frame drawn with only the changed cells, the
+# window is compared with a full redraw of the same frame. The check fails
+# (exit status 1) if any frame differs. Example:
+#
+#    python check_display.py --games 3 --steps 1500
+
+# the grid is drawn on an offscreen surface unless another video driver is set
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+
+# Plays a seeded game with random actions and returns the number of frames for
+# which the incremental drawing differs from a full redraw
+def check_game(seed, steps):
+    import pygame
+    import stddraw
+    engine = GameEngine(seed=seed)
+    rng = random.Random(seed)
+    actions = (None,) + GameEngine.actions
+    mismatches = 0
+    for step in range(steps):
+        if engine.game_over:
+            break
+        engine.step(rng.choice(actions))
+        engine.grid.display(engine.score, 0)
+        # the pixels shown in the window (copied from the drawing canvas)
+        incremental = pygame.surfarray.array3d(stddraw._background)
+        engine.grid.invalidate_display()
+        engine.grid.display(engine.score, 0)
+        full = pygame.surfarray.array3d(stddraw._background)
+        if (incremental != full).any():
+            mismatches += 1
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that the incremental drawing of the game grid gives "
+                    "the same frames as full redraws.")
+    parser.add_argument("--games", type=int, default=3, help="number of games")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game (the next games use the next seeds)")
+    parser.add_argument("--steps", type=int, default=1500,
+                        help="maximum number of steps of a game")
+    args = parser.parse_args(argv)
+    import stddraw
+    # set the canvas up as the game does (see start in Tetris_2048.py)
+    grid_h, grid_w = 20, 12
+    stddraw.setCanvasSize(40 * grid_w + 100, 40 * grid_h)
+    stddraw.setXscale(-0.5, grid_w + 3)
+    stddraw.setYscale(-0.5, grid_h - 0.5)
+    failed = 0
+    for game in range(args.games):
+        mismatches = check_game(args.seed + game, args.steps)
+        print("game %d: %d frames differ from a full redraw" % (game, mismatches))
+        failed += mismatches > 0
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import argparse  # used for parsing the command-line arguments
+import random  # used for choosing the actions of the games
+import sys
+import numpy as np  # fundamental Python module for scientific computing
+from engine import GameEngine  # runs the game rules (headless)
+from batch_engine import BatchEngine, TYPES, ACTIONS  # games in lockstep
+
+# Regression check of the batch engine (see batch_engine.py): seeded games are
+# played with random actions on GameEngine, then the same games (with the same
+# tetrominoes and the same actions) are played together on a BatchEngine. The
+# check fails (exit status 1) if the boards, the scores, the numbers of pieces
+# placed or the game over flags of any game differ. Example:
+#
+#    python check_engine.py --games 64 --steps 3000
+
+
+# Class used for replaying the tetrominoes of recorded games in a batch engine
+# instead of spawning random ones
+class ScriptedBatchEngine(BatchEngine):
+    # Constructor that creates a batch of games with the given tetrominoes, each
+    # one given as (type index, x, tile exponents) in the order of their spawns
+    def __init__(self, tetrominoes, grid_h=20, grid_w=12):
+        self.tetrominoes = [list(reversed(game)) for game in tetrominoes]
+        BatchEngine.__init__(self, len(tetrominoes), grid_h, grid_w)
+
+    # Method for creating the next recorded tetrominoes in the given games
+    def spawn(self, games):
+        for game in games.tolist():
+            if not self.tetrominoes[game]:
+                continue
+            type_index, x, exponents = self.tetrominoes[game].pop()
+            self.types[game] = type_index
+            self.rotations[game] = 0
+            self.xs[game] = x
+            self.ys[game] = self.grid_height
+            self.exponents[game] = exponents
+
+
+# Returns the (type index, x, tile exponents) description of a tetromino used
+# by ScriptedBatchEngine
+def describe_tetromino(tetromino):
+    return (TYPES.index(tetromino.type), tetromino.bottom_left_corner.x,
+            [tile.number.bit_length() - 1 for tile in tetromino.tiles])
+
+
+# Plays a seeded game with random actions, returns the tetrominoes spawned, the
+# action codes of the steps (indices in batch_engine.ACTIONS) and the engine
+def play_game(seed, steps):
+    engine = GameEngine(seed=seed)
+    rng = random.Random(seed)
+    tetrominoes = [describe_tetromino(engine.current_tetromino)]
+    spawn = engine.spawn
+
+    def recorded_spawn():
+        tetromino = spawn()
+        tetrominoes.append(describe_tetromino(tetromino))
+        return tetromino
+    engine.spawn = recorded_spawn
+    codes = []
+    while not engine.game_over and len(codes) < steps:
+        # no action in about a third of the steps
+        code = rng.choice((0, 0, 1, 2, 3, 4, 5))
+        codes.append(code)
+        engine.step(ACTIONS[code])
+    return tetrominoes, codes, engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that the batch engine plays the same games as "
+                    "GameEngine.")
+    parser.add_argument("--games", type=int, default=64, help="number of games")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game (the next games use the next seeds)")
+    parser.add_argument("--steps", type=int, default=3000,
+                        help="maximum number of steps of a game")
+    args = parser.parse_args(argv)
+    games = [play_game(args.seed + game, args.steps) for game in range(args.games)]
+    batch = ScriptedBatchEngine([tetrominoes for tetrominoes, codes, engine in games])
+    for step in range(max(len(codes) for tetrominoes, codes, engine in games)):
+        batch.step(np.array([codes[step] if step < len(codes) else 0
+                             for tetrominoes, codes, engine in games]))
+    failed = 0
+    for game, (tetrominoes, codes, engine) in enumerate(games):
+        if not (batch.values[game] == engine.grid.value_matrix).all() or \
+                batch.scores[game] != engine.score or \
+                batch.pieces_placed[game] != engine.pieces_placed or \
+                batch.game_over[game] != engine.game_over:
+            print("game %d: the batch engine gives score %d, %d pieces instead "
+                  "of score %d, %d pieces" % (game, batch.scores[game],
+                                               batch.pieces_placed[game],
+                                               engine.score, engine.pieces_placed))
+            failed += 1
+    print("%d of %d games differ between GameEngine and the batch engine"
+          % (failed, len(games)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import argparse  # used for parsing the command-line arguments
+import random  # used for choosing the actions of the games
+import sys
+from engine import GameEngine  # runs the game rules (headless)
+from placements import find_placements  # placements of the tetrominoes
+
+# Regression check of the placements of the tetrominoes (see placements.py): in
+# random positions of seeded games, the moves of the path of each placement
+# found for the current tetromino are applied to it one by one. The check fails
+# (exit status 1) if a move of a path cannot be applied, or if a path does not
+# take the tetromino to the position, rotation and cells of its placement, or
+# to a position where it cannot move down. Example:
+#
+#    python check_placements.py --positions 300
+
+
+# Applies the path of a placement to the current tetromino of a game from its
+# current state (which is restored afterwards), returns None when the path
+# reaches the placement or a description of the first difference otherwise
+def check_placement(engine, placement):
+    tetromino, grid = engine.current_tetromino, engine.grid
+    state = tetromino.get_state()
+    try:
+        for move in placement.path:
+            if move == "up":
+                moved = tetromino.rotateTetromino(grid)
+            else:
+                moved = tetromino.move(move, grid)
+            if not moved:
+                return "move %r of the path cannot be applied" % move
+        corner = tetromino.bottom_left_corner
+        if (corner.x, corner.y, tetromino.rotation) != \
+                (placement.x, placement.y, placement.rotation):
+            return "the path ends at x=%d, y=%d, rotation=%d" % (
+                corner.x, corner.y, tetromino.rotation)
+        if tetromino.can_be_moved("down", grid):
+            return "the tetromino can still move down"
+        cells = sorted((tile.position.x, tile.position.y, tile.number)
+                       for tile in tetromino.tiles)
+        if cells != sorted(placement.cells):
+            return "the path ends on the cells %r" % (cells,)
+        return None
+    finally:
+        tetromino.set_state(state)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that the path of each placement found reaches it.")
+    parser.add_argument("--positions", type=int, default=300,
+                        help="number of random positions")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the positions")
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    failed = checked = 0
+    for position in range(args.positions):
+        # play a few random actions from the start of a seeded game
+        engine = GameEngine(seed=rng.getrandbits(32))
+        for i in range(rng.randint(0, 25)):
+            if engine.game_over:
+                break
+            engine.step(rng.choice(GameEngine.actions))
+        if engine.game_over:
+            continue
+        for placement in find_placements(engine.grid, engine.current_tetromino):
+            checked += 1
+            error = check_placement(engine, placement)
+            if error is not None:
+                print("position %d, %r: %s" % (position, placement, error))
+                failed += 1
+    print("%d of %d placements are not reached by their paths" % (failed, checked))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
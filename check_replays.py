@@ -0,0 +1,54 @@
+import argparse  # used for parsing the command-line arguments
+import random  # used for choosing the actions of the games
+import sys
+from engine import GameEngine  # runs the game rules (headless)
+from replay import start_recording, play_replay  # recorded games
+
+# Regression check of the replays (see replay.py): seeded games are played and
+# recorded with random actions (several actions in some ticks, none in most),
+# then each replay is played headless with play_replay. The check fails (exit
+# status 1) if a replay does not end with the same board, score, number of
+# pieces placed and number of ticks as the recorded game. Example:
+#
+#    python check_replays.py --games 20
+
+
+# Plays and records a seeded game with random actions, returns the engine and
+# the replay of the game
+def record_game(seed, max_ticks):
+    rng = random.Random(seed)
+    engine = GameEngine(gravity_ticks=rng.choice((1, 15)), seed=seed)
+    recorder = start_recording(engine)
+    while not engine.game_over and engine.ticks < max_ticks:
+        engine.tick([action for action in GameEngine.actions
+                     if rng.random() < 0.04])
+    return engine, recorder.to_bytes()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that replays play the same games as the recorded ones.")
+    parser.add_argument("--games", type=int, default=20, help="number of games")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game (the next games use the next seeds)")
+    parser.add_argument("--max-ticks", type=int, default=100000,
+                        help="maximum number of ticks of a game")
+    args = parser.parse_args(argv)
+    failed = 0
+    for game in range(args.games):
+        engine, data = record_game(args.seed + game, args.max_ticks)
+        replayed = play_replay(data)
+        same = (replayed.grid.value_matrix == engine.grid.value_matrix).all() and \
+            replayed.score == engine.score and \
+            replayed.pieces_placed == engine.pieces_placed and \
+            replayed.ticks == engine.ticks
+        print("game %d: %d ticks, %d pieces, %d bytes%s" % (
+            game, engine.ticks, engine.pieces_placed, len(data),
+            "" if same else ", the replay gives score %d, %d pieces, %d ticks" % (
+                replayed.score, replayed.pieces_placed, replayed.ticks)))
+        failed += not same
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
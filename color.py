@@ -1,18 +1,98 @@
+import weakref
+
+
 class Color:
     """
-    A Color object models an RGB color.
+    A Color object models an RGB color. Color objects are immutable
+    and interned: Color(r, g, b) returns the existing object with the
+    same components if there is one, so equal colors are the same
+    object and can be shared (and compared and hashed cheaply).
     """
 
+    __slots__ = ('_r', '_g', '_b', '_pygameColor', '__weakref__')
+
+    # The Color objects in use, keyed by their components.
+    _interned = weakref.WeakValueDictionary()
+
+    #-------------------------------------------------------------------
+
+    def __new__(cls, r=0, g=0, b=0):
+        """
+        Return the Color object with the given red (r), green (g),
+        and blue (b) components, creating it if it does not exist.
+        """
+        key = (r, g, b)
+        self = Color._interned.get(key)
+        if self is None:
+            self = object.__new__(cls)
+            object.__setattr__(self, '_r', r)  # Red component
+            object.__setattr__(self, '_g', g)  # Green component
+            object.__setattr__(self, '_b', b)  # Blue component
+            # Equivalent pygame.Color, set by stddraw when first needed.
+            object.__setattr__(self, '_pygameColor', None)
+            Color._interned[key] = self
+        return self
+
+    #-------------------------------------------------------------------
+
+    def __setattr__(self, name, value):
+        """
+        Raise an AttributeError: Color objects are immutable.
+        """
+        raise AttributeError('Color objects are immutable')
+
+    #-------------------------------------------------------------------
+
+    def __delattr__(self, name):
+        """
+        Raise an AttributeError: Color objects are immutable.
+        """
+        raise AttributeError('Color objects are immutable')
+
+    #-------------------------------------------------------------------
+
+    def __reduce__(self):
+        """
+        Return the arguments that recreate (and intern) self when it is
+        unpickled or copied.
+        """
+        return (Color, (self._r, self._g, self._b))
+
+    #-------------------------------------------------------------------
+
+    def __eq__(self, other):
+        """
+        Return True if other is a Color with the same components as self.
+        """
+        if not isinstance(other, Color):
+            return NotImplemented
+        return (self._r, self._g, self._b) == (other._r, other._g, other._b)
+
+    #-------------------------------------------------------------------
+
+    def __hash__(self):
+        """
+        Return the hash of the components of self.
+        """
+        return hash((self._r, self._g, self._b))
+
+    #-------------------------------------------------------------------
+
+    def getPygameColor(self):
+        """
+        Return the pygame.Color cached for self by stddraw, or None if
+        self has not been converted yet.
+        """
+        return self._pygameColor
+
     #-------------------------------------------------------------------
 
-    def __init__(self, r=0, g=0, b=0):
+    def setPygameColor(self, pygameColor):
         """
-        Construct self such that it has the given red (r),
-        green (g), and blue (b) components.
+        Cache pygameColor, the pygame.Color equivalent to self, on self.
+        The cache is not part of the value of self.
         """
-        self._r = r  # Red component
-        self._g = g  # Green component
-        self._b = b  # Blue component
+        object.__setattr__(self, '_pygameColor', pygameColor)
 
     #-------------------------------------------------------------------
 
@@ -41,6 +121,14 @@ class Color:
     #-------------------------------------------------------------------
 
 
+    def __repr__(self):
+        """
+        Return the string representation of self.
+        """
+        return 'Color(%r, %r, %r)' % (self._r, self._g, self._b)
+
+    #-------------------------------------------------------------------
+
     def __str__(self):
         """
         Return the string equivalent of self, that is, a
@@ -0,0 +1,266 @@
+import random  # used for creating tetrominoes with random types/shapes
+from collections import namedtuple  # used for the snapshots of the games
+from game_grid import GameGrid  # class for modeling the game grid
+from tetromino import Tetromino  # class for modeling the tetrominoes
+
+
+# Creates a tetromino with a random type/shape above the game grid, rng is the
+# random number generator used for the type, the position and the tile numbers
+# (the random module by default)
+def create_tetromino(grid_height, grid_width, rng=random):
+    tetromino_types = ['I', 'O', 'Z', 'L', 'J', 'S', 'T']
+    random_index = rng.randint(0, len(tetromino_types) - 1)
+    random_type = tetromino_types[random_index]
+
+    tetromino = Tetromino(random_type, grid_height, grid_width, rng=rng)
+    return tetromino
+
+
+# Immutable snapshot of the state of a game (see GameEngine.snapshot): the tiles
+# on the grid (see GameGrid.snapshot), the state of the current tetromino (see
+# Tetromino.get_state), the counters of the game and the state of its random
+# number generator. Consecutive snapshots share the grid bytes and the random
+# number generator state as long as they do not change.
+GameSnapshot = namedtuple("GameSnapshot", (
+    "grid", "tetromino", "score", "pieces_placed", "max_tile", "game_over",
+    "ticks", "ticks_to_gravity", "rng_state"))
+
+
+# Class used for running the game rules without any window, input polling or
+# sleeping, so that games can be simulated headless (e.g. by bots or on servers)
+# as well as driven by the interactive loop in Tetris_2048.py
+class GameEngine:
+    # actions that can be applied to the current tetromino
+    actions = ("left", "right", "down", "up", "space")
+
+    # Constructor that creates an empty game grid and spawns the first tetromino,
+    # gravity_ticks is the number of simulation ticks (see tick) between two
+    # moves of the tetromino down and seed is the seed of the random number
+    # generator of the game (a random seed when it is None), so two games with
+    # the same seed and the same actions are the same
+    def __init__(self, grid_h=20, grid_w=12, gravity_ticks=1, seed=None):
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.gravity_ticks = gravity_ticks
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # object the actions of each tick are passed to (see replay.py)
+        self.recorder = None
+        # create the game grid
+        self.grid = GameGrid(grid_h, grid_w)
+        # the tetromino that is currently being moved on the game grid
+        self.current_tetromino = None
+        # game state
+        self.score = 0
+        self.pieces_placed = 0
+        # largest tile number merged or placed on the grid so far
+        self.max_tile = 0
+        self.game_over = False
+        # number of simulation ticks so far and until the next gravity step
+        self.ticks = 0
+        self.ticks_to_gravity = gravity_ticks
+        # state of the random number generator for the snapshots, shared by the
+        # snapshots taken until the next tetromino is spawned (None when the
+        # random number generator has been used since the last snapshot)
+        self._rng_state = None
+        # create the first tetromino to enter the game grid
+        self.spawn()
+
+    # Method for creating a new tetromino above the game grid
+    def spawn(self):
+        self.current_tetromino = create_tetromino(self.grid_height, self.grid_width,
+                                                  self.rng)
+        self._rng_state = None
+        self.grid.current_tetromino = self.current_tetromino
+        return self.current_tetromino
+
+    # Method for getting the next n tetrominoes that will be spawned, which are
+    # created with a copy of the random number generator of the game so that the
+    # game does not change
+    def upcoming(self, n):
+        rng = random.Random()
+        rng.setstate(self.rng.getstate())
+        return [create_tetromino(self.grid_height, self.grid_width, rng)
+                for i in range(n)]
+
+    # Method for taking a snapshot of the state of the game (see GameSnapshot),
+    # which can be restored any number of times with restore (e.g. for undoing
+    # moves or for trying moves in a search)
+    def snapshot(self):
+        if self._rng_state is None:
+            self._rng_state = self.rng.getstate()
+        return GameSnapshot(self.grid.snapshot(), self.current_tetromino.get_state(),
+                            self.score, self.pieces_placed, self.max_tile,
+                            self.game_over, self.ticks, self.ticks_to_gravity,
+                            self._rng_state)
+
+    # Method for restoring the state of the game from a snapshot taken with
+    # snapshot on this engine or on an engine with the same grid size and
+    # gravity_ticks. The current tetromino is reused when it has the type of
+    # the one in the snapshot. The recorder (if any) is not changed, so a
+    # recorded game that is restored cannot be replayed.
+    def restore(self, snapshot):
+        self.grid.restore(snapshot.grid)
+        type = snapshot.tetromino[0]
+        tetromino = self.current_tetromino
+        if tetromino is None or tetromino.type != type:
+            # the tetromino is created with a throwaway random number generator,
+            # then moved, rotated and numbered as the saved one
+            tetromino = Tetromino(type, self.grid_height, self.grid_width,
+                                  rng=random.Random(0))
+        tetromino.set_state(snapshot.tetromino)
+        self.current_tetromino = self.grid.current_tetromino = tetromino
+        self.score = snapshot.score
+        self.pieces_placed = snapshot.pieces_placed
+        self.max_tile = snapshot.max_tile
+        self.game_over = self.grid.game_over = snapshot.game_over
+        self.ticks = snapshot.ticks
+        self.ticks_to_gravity = snapshot.ticks_to_gravity
+        if snapshot.rng_state is not self._rng_state:
+            self.rng.setstate(snapshot.rng_state)
+            self._rng_state = snapshot.rng_state
+
+    # Method for applying a single action (a key name) to the current tetromino,
+    # returns True if the tetromino has been moved or rotated
+    def apply_action(self, action):
+        if self.game_over:
+            return False
+        if action == "left" or action == "right" or action == "down":
+            # move the tetromino by one in the given direction
+            return self.current_tetromino.move(action, self.grid)
+        if action == "up":
+            # rotate the tetromino
+            return self.current_tetromino.rotateTetromino(self.grid)
+        if action == "space":
+            # drop the tetromino
+            return self.hard_drop()
+        return False
+
+    # Method for dropping the current tetromino as far as it can go (at most
+    # grid_height rows), the drop distance is computed from the heights of the
+    # columns of the grid (see GameGrid.drop_distance)
+    def hard_drop(self):
+        tetromino = self.current_tetromino
+        distance = self.grid.drop_distance(tetromino, self.grid_height)
+        if distance == 0:
+            return False
+        tetromino.bottom_left_corner.y -= distance
+        tetromino.update_tile_positions()
+        return True
+
+    # Method for advancing the game by one gravity step, returns False when the
+    # current tetromino could not move down and has been locked into the grid
+    def gravity_step(self):
+        if self.game_over:
+            return False
+        # move (drop) the tetromino down by 1
+        success = self.current_tetromino.move("down", self.grid)
+        # drop the tiles that are not connected to the bottom of the grid
+        self.grid.connected_4_neighbor()
+        if not success:
+            self.lock()
+        return success
+
+    # Method for applying an optional action, or a list of actions, in a single
+    # tick (see tick), with the default gravity_ticks = 1 the actions are followed
+    # by one gravity step
+    def step(self, action=None):
+        if action is None:
+            return self.tick(())
+        if isinstance(action, str):
+            return self.tick((action,))
+        return self.tick(action)
+
+    # Method for advancing the game by one fixed simulation tick: all the given
+    # actions are applied in order and the tetromino is moved down once every
+    # gravity_ticks ticks, so the speed of the game does not depend on how often
+    # the game is drawn. A dropped tetromino is moved down right away instead
+    # (which locks it) and the gravity interval starts again.
+    # Returns False when a tetromino has been locked into the grid in this tick,
+    # raises ValueError (before anything is changed or recorded) when one of the
+    # actions is not in actions
+    def tick(self, actions=()):
+        for action in actions:
+            if action not in self.actions:
+                raise ValueError("unknown action: %r" % (action,))
+        if self.recorder is not None:
+            self.recorder.record_tick(actions)
+        moved = True
+        dropped = False
+        for action in actions:
+            if self.game_over:
+                return False
+            self.apply_action(action)
+            if action == "space":
+                moved = self.gravity_step() and moved
+                dropped = True
+        self.ticks += 1
+        self.ticks_to_gravity -= 1
+        if dropped:
+            self.ticks_to_gravity = self.gravity_ticks
+        elif self.ticks_to_gravity <= 0:
+            self.ticks_to_gravity = self.gravity_ticks
+            moved = self.gravity_step() and moved
+        return moved
+
+    # Method for advancing the game by n ticks without actions, which gives the
+    # same game as calling tick() n times but only runs the gravity steps (used
+    # for fast-forwarding replays)
+    def idle_ticks(self, n):
+        if self.recorder is not None:
+            self.recorder.record_idle_ticks(n)
+        while n > 0 and not self.game_over:
+            if n < self.ticks_to_gravity:
+                self.ticks += n
+                self.ticks_to_gravity -= n
+                return
+            n -= self.ticks_to_gravity
+            self.ticks += self.ticks_to_gravity
+            self.ticks_to_gravity = self.gravity_ticks
+            self.gravity_step()
+        # nothing but the tick counters change once the game is over
+        self.ticks += n
+        self.ticks_to_gravity = (self.ticks_to_gravity - n - 1) % self.gravity_ticks + 1
+
+    # Method for placing the current tetromino on the grid, then merging the
+    # tiles, clearing the full rows and updating the score
+    def lock(self):
+        grid = self.grid
+        tiles = self.current_tetromino.tile_matrix
+        self.game_over = grid.update_grid(tiles)
+        self.pieces_placed += 1
+
+        rows_score = 0
+        # merge the tiles, then clear all the full rows at once and merge again
+        # as long as the merges make new rows full
+        grid.merging()
+        self.max_tile = max(self.max_tile, 1 << int(grid.value_matrix.max()))
+        cleared_rows = grid.clear_full_rows()
+        while cleared_rows:
+            for row in cleared_rows:
+                rows_score += grid.update_score(row)
+            grid.merging()
+            self.max_tile = max(self.max_tile, 1 << int(grid.value_matrix.max()))
+            cleared_rows = grid.clear_full_rows()
+        # drop the tiles left floating by the merges and the cleared rows
+        grid.connected_4_neighbor()
+        self.score += int(rows_score)
+
+        if not self.game_over:
+            self.spawn()
+        return self.game_over
+
+    # Method for playing until the game is over or max_steps steps have been
+    # taken, choose_action is called with the engine before each step and returns
+    # the action or the list of actions of the step
+    def run(self, choose_action=None, max_steps=None):
+        steps = 0
+        while not self.game_over:
+            if max_steps is not None and steps >= max_steps:
+                break
+            action = choose_action(self) if choose_action is not None else None
+            self.step(action)
+            steps += 1
+        return self.score
@@ -0,0 +1,164 @@
+import collections  # used for the rolling windows of the phase times
+import csv  # used for exporting the frame times as CSV
+import json  # used for exporting the frame times as JSON lines
+import time  # used for timing the phases
+
+# Opt-in timing of where the time of each frame of the game loop goes (see start
+# in Tetris_2048.py). Nothing is timed until FrameTimings.instrument is called:
+# it replaces the functions of each phase with timed wrappers on the given
+# objects (so the game loop runs the original functions, with no timing cost,
+# when the timings are disabled) and FrameTimings.restore puts the original
+# functions back. The time of a phase does not include the time of the phases
+# called from it (e.g. "display" does not include "show"), and "other" is the
+# rest of the frame (mostly sleeping until the next frame is due).
+
+# functions timed in each phase, given as (kind of object, attribute names)
+PHASES = (
+    ("input", "stddraw", ("pollEvents", "nextEvents")),
+    ("tick", "engine", ("tick",)),
+    ("move", "tetromino", ("move", "rotateTetromino")),
+    ("connected_4_neighbor", "grid", ("connected_4_neighbor",)),
+    ("update_grid", "grid", ("update_grid",)),
+    ("merging", "grid", ("merging", "is_full", "clear_full_rows")),
+    ("display", "grid", ("display",)),
+    ("show", "stddraw", ("show", "showDirty")),
+)
+PHASE_NAMES = tuple(name for name, kind, attributes in PHASES) + ("other",)
+# percentiles computed over the rolling window of each phase
+PERCENTILES = (50, 95, 99)
+
+
+# Returns the given percentile of a sorted list of values (nearest rank)
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1,
+                       round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+# Class used for timing the phases of the frames of the game loop
+class FrameTimings:
+    # Constructor that creates the timings with rolling windows of the given
+    # number of frames for the percentiles
+    def __init__(self, window=600):
+        self.clock = time.perf_counter
+        # time spent in each phase in the current frame
+        self.frame = dict.fromkeys(PHASE_NAMES, 0.0)
+        self.frame_start = self.clock()
+        # times of the phases of all the frames (for the export) and of the last
+        # frames (for the percentiles)
+        self.frames = []
+        self.windows = {name: collections.deque(maxlen=window)
+                        for name in PHASE_NAMES + ("total",)}
+        # time spent in the phases called from the running timed functions
+        self._nested = []
+        # (object, attribute name, original value or None) of each wrapper
+        self._patched = []
+
+    # Method for getting a wrapper of function that adds its time to the given
+    # phase of the current frame
+    def timed(self, phase, function):
+        clock, nested, frame = self.clock, self._nested, self.frame
+
+        def timed_function(*args, **kwargs):
+            nested.append(0.0)
+            start_time = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start_time
+                frame[phase] += elapsed - nested.pop()
+                if nested:
+                    nested[-1] += elapsed
+        return timed_function
+
+    # Method for replacing an attribute of an object (a module, a class instance)
+    # with a timed wrapper
+    def patch(self, phase, obj, attribute):
+        original = obj.__dict__.get(attribute) if hasattr(obj, "__dict__") else None
+        self._patched.append((obj, attribute, original))
+        setattr(obj, attribute, self.timed(phase, getattr(obj, attribute)))
+
+    # Method for timing the phases of the game played on the given engine and
+    # drawn with the given stddraw module, the tetrominoes spawned later are
+    # timed too
+    def instrument(self, engine, stddraw):
+        objects = {"stddraw": stddraw, "engine": engine, "grid": engine.grid}
+        for phase, kind, attributes in PHASES:
+            if kind in objects:
+                for attribute in attributes:
+                    self.patch(phase, objects[kind], attribute)
+        self.instrument_tetromino(engine.current_tetromino)
+        spawn = engine.spawn
+
+        def timed_spawn():
+            tetromino = spawn()
+            self.instrument_tetromino(tetromino)
+            return tetromino
+        self._patched.append((engine, "spawn", None))
+        engine.spawn = timed_spawn
+
+    # Method for timing the moves of a tetromino
+    def instrument_tetromino(self, tetromino):
+        for phase, kind, attributes in PHASES:
+            if kind == "tetromino":
+                for attribute in attributes:
+                    setattr(tetromino, attribute,
+                            self.timed(phase, getattr(tetromino, attribute)))
+
+    # Method for putting the original functions back
+    def restore(self):
+        for obj, attribute, original in reversed(self._patched):
+            if original is None:
+                delattr(obj, attribute)
+            else:
+                setattr(obj, attribute, original)
+        self._patched = []
+
+    # Method for ending the current frame (called after each drawn frame)
+    def end_frame(self):
+        now = self.clock()
+        total = now - self.frame_start
+        self.frame_start = now
+        self.frame["other"] = max(0.0, total - sum(self.frame.values()))
+        record = dict(self.frame, total=total)
+        self.frames.append(record)
+        for name, value in record.items():
+            self.windows[name].append(value)
+        for name in PHASE_NAMES:
+            self.frame[name] = 0.0
+
+    # Method for getting the percentiles of the time of each phase (in
+    # milliseconds) over the last frames
+    def percentiles(self):
+        result = {}
+        for name, window in self.windows.items():
+            values = sorted(window)
+            result[name] = {"p%d" % p: 1000 * percentile(values, p)
+                            for p in PERCENTILES}
+        return result
+
+    # Method for exporting the times of the phases of each frame (in
+    # milliseconds) as CSV when the path ends with .csv, as JSON lines otherwise
+    def export(self, path):
+        columns = ("frame",) + PHASE_NAMES + ("total",)
+        rows = ([i] + [1000 * frame[name] for name in columns[1:]]
+                for i, frame in enumerate(self.frames))
+        with open(path, "w", newline="") as file:
+            if path.endswith(".csv"):
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    file.write(json.dumps(dict(zip(columns, row))) + "\n")
+
+    # Method for getting a table of the percentiles of each phase
+    def report(self):
+        lines = ["%-22s %9s %9s %9s" % (("phase",) + tuple(
+            "p%d ms" % p for p in PERCENTILES))]
+        for name, stats in self.percentiles().items():
+            lines.append("%-22s %9.3f %9.3f %9.3f" % ((name,) + tuple(
+                stats["p%d" % p] for p in PERCENTILES)))
+        return "\n".join(lines)
@@ -1,10 +1,13 @@
-import stddraw  # the stddraw module is used as a basic graphics library
 from color import Color  # used for coloring the game grid
 import numpy as np  # fundamental Python module for scientific computing
-import copy as cp
 from tetromino import Tetromino
-import pygame
-import os
+from tile import draw_tile  # used for drawing the tiles on the game grid
+from point import Point  # used for tile positions
+from grid_kernels import merge_all, number_to_exponent  # vectorized merging
+from grid_kernels import find_supported, drop_floating  # floating tiles
+from grid_kernels import clear_full_rows, exponents_to_numbers  # full rows
+from grid_kernels import column_heights  # skyline of the grid
+from zobrist import zobrist_key, update_zobrist_hash  # board hashing
 
 
 # Class used for modelling the game grid
@@ -14,11 +17,27 @@ class GameGrid:
         # set the dimensions of the game grid as the given arguments
         self.grid_height = grid_h
         self.grid_width = grid_w
-        # create the tile matrix to store the tiles placed on the game grid
-        self.tile_matrix = np.full((grid_h, grid_w), None)
-        # create an array that contains full row's tile values
-        self.tile_num = np.zeros(grid_w)  # for full row score
-        self.tile_num2 = np.zeros(100)  # for merged score
+        # create the value matrix to store the tiles placed on the game grid as
+        # exponents of their numbers (0 = empty cell, k = tile with number 2 ** k)
+        self.value_matrix = np.zeros((grid_h, grid_w), dtype=np.uint8)
+        # Zobrist hash of the value matrix (see zobrist.py), updated with each
+        # change of the value matrix (0 for the empty grid)
+        self.zobrist_hash = 0
+        # occupancy of each row stored as a bitmask (bit col is set when the cell
+        # at col is occupied), rebuilt lazily after the value matrix changes
+        self._row_masks = [0] * grid_h
+        self._row_masks_dirty = False
+        # height of each column (the row above its highest tile, see
+        # grid_kernels.column_heights), updated with each placed tile and
+        # rebuilt lazily after the other changes of the value matrix
+        self._heights = [0] * grid_w
+        self._heights_dirty = False
+        # bytes of the value matrix returned by the last snapshot (None when the
+        # value matrix has changed since), shared by the snapshots taken until
+        # the value matrix changes
+        self._snapshot_values = None
+        # whether the tiles are known to be all connected to the bottom of the grid
+        self._settled = True
         # the tetromino that is currently being moved on the game grid
         self.current_tetromino = None
         # game_over flag shows whether the game is over/completed or not
@@ -28,35 +47,157 @@ class GameGrid:
         # set the colors used for the grid lines and the grid boundaries
         self.line_color = Color(188, 172, 158)
         self.boundary_color = Color(132, 122, 113)
+        # set the colors used for the score panel and its texts
+        self.panel_color = Color(167, 160, 151)
+        self.text_color = Color(0, 0, 0)
         # thickness values used for the grid lines and the grid boundaries
         self.line_thickness = 0.002
         self.box_thickness = 8 * self.line_thickness
+        # exponents of the tiles drawn on each cell and the contents of the score
+        # panel in the last displayed frame (None when the whole canvas must be
+        # redrawn)
+        self._drawn_cells = None
+        self._drawn_panel = None
+        # layers with the static parts of the canvas and the canvas size, scale
+        # and colors they have been rendered with
+        self._layers = None
+        self._layers_key = None
 
     # Method used for displaying the game grid
+    # Only the cells and the score panel that changed since the last displayed
+    # frame are redrawn and copied to the window, the empty cells, the grid
+    # lines, the boundaries and the score panel are copied from layers rendered
+    # once (see get_layers)
     def display(self, score, speed):
-        # clear the background canvas to empty_cell_color
-        stddraw.clear(self.empty_cell_color)
-        # draw the game grid
-        self.draw_grid()
-        # draw the score
-        self.draw_score(score)
-        # draw the current (active) tetromino
-        if self.current_tetromino != None:
-            self.current_tetromino.draw()
-        # draw a box around the game grid
-        self.draw_boundaries()
-        # show the resulting drawing with a pause duration = 250 ms
-        stddraw.show(speed)
-
-    # Method for drawing the cells and the lines of the grid
+        # stddraw (and so pygame) is imported only when the grid is drawn, which
+        # keeps the game logic usable without a display
+        import stddraw
+        # render the layers again if the canvas or the colors have changed, the
+        # drawing methods below use the layers rendered here
+        self.get_layers()
+        cells = self.get_frame_cells()
+        panel = self.get_panel_state(score)
+        if self._drawn_cells is None:
+            # draw the game grid with a box around it
+            self.draw_grid()
+            # draw the score
+            self.draw_score(score)
+            # draw the current (active) tetromino
+            self.draw_current_tetromino()
+            # show the resulting drawing with a pause duration = 250 ms
+            stddraw.show(speed)
+        else:
+            # redraw the cells that changed since the last frame
+            rows, cols = np.nonzero(cells != self._drawn_cells)
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                self.draw_cell(row, col, int(cells[row, col]))
+                stddraw.markDirty(col - 0.5, row - 0.5, 1, 1)
+            # the current tetromino is drawn over the grid lines
+            if len(rows) > 0:
+                self.draw_current_tetromino()
+            if panel != self._drawn_panel:
+                self.draw_score(score)
+                stddraw.markDirty(self.grid_width - 0.5, -0.5, 3.5, self.grid_height)
+            # show the changed parts with a pause duration = speed ms
+            stddraw.showDirty(speed)
+        self._drawn_cells = cells
+        self._drawn_panel = panel
+
+    # Method for getting the layers with the parts of the canvas that do not
+    # change from frame to frame: "background" (the empty grid with its lines
+    # and boundaries and the score panel without the score and the next
+    # tetromino), "lines" (the inner grid lines) and "boundaries" (the box
+    # around the grid). The layers are rendered again only when the canvas size,
+    # the scale or the colors change.
+    def get_layers(self):
+        import stddraw
+        key = (stddraw.scaleVersion(), self.empty_cell_color, self.line_color,
+               self.boundary_color, self.panel_color, self.text_color)
+        if self._layers_key != key:
+            stddraw.beginLayer(opaque=True)
+            stddraw.clear(self.empty_cell_color)
+            self.draw_grid_lines()
+            self.draw_score_panel()
+            self.draw_boundaries()
+            self._layers = {"background": stddraw.endLayer()}
+            for name, draw in (("lines", self.draw_grid_lines),
+                               ("boundaries", self.draw_boundaries)):
+                stddraw.beginLayer()
+                draw()
+                self._layers[name] = stddraw.endLayer()
+            self._layers_key = key
+            # the whole canvas is redrawn with the new layers
+            self.invalidate_display()
+        return self._layers
+
+    # Method for redrawing the whole canvas on the next displayed frame
+    def invalidate_display(self):
+        self._drawn_cells = None
+        self._drawn_panel = None
+
+    # Method for getting the exponents of the tiles to draw on each cell, that is
+    # the value matrix with the tiles of the current tetromino placed on it
+    def get_frame_cells(self):
+        cells = self.value_matrix.copy()
+        if self.current_tetromino is not None:
+            for tile in self.current_tetromino.tiles:
+                x, y = tile.position.x, tile.position.y
+                if self.is_inside(y, x):
+                    cells[y, x] = number_to_exponent(tile.number)
+        return cells
+
+    # Method for getting what the score panel shows (the score and the tiles
+    # of the current tetromino in the next section)
+    def get_panel_state(self, score):
+        if self.current_tetromino is None:
+            return score, None
+        return score, self.current_tetromino.type, \
+            tuple(tile.number for tile in self.current_tetromino.tiles)
+
+    # Method for drawing a single cell of the grid with the tile having the given
+    # exponent (0 for an empty cell), together with the grid lines and the
+    # boundaries on it
+    def draw_cell(self, row, col, exponent):
+        import stddraw
+        layers = self._layers or self.get_layers()
+        if exponent == 0:
+            # an empty cell is copied from the background layer, which covers
+            # exactly the same pixels as a tile
+            stddraw.layer(layers["background"], col - 0.5, row - 0.5, 1, 1)
+        else:
+            draw_tile(1 << exponent, col, row)
+            stddraw.layer(layers["lines"], col - 0.5, row - 0.5, 1, 1)
+            stddraw.layer(layers["boundaries"], col - 0.5, row - 0.5, 1, 1)
+
+    # Method for drawing the cells, the lines and the boundaries of the grid
     def draw_grid(self):
-        # draw each cell of the game grid
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                # draw the tile if the grid cell is occupied by a tile
-                if self.tile_matrix[row][col] != None:
-                    self.tile_matrix[row][col].draw()
-                    # draw the inner lines of the grid
+        import stddraw
+        # copy the empty grid from the background layer
+        stddraw.layer((self._layers or self.get_layers())["background"])
+        # draw each cell of the game grid occupied by a tile
+        rows, cols = np.nonzero(self.value_matrix)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            self.draw_cell(row, col, int(self.value_matrix[row, col]))
+
+    # Method for drawing the tiles of the current tetromino that are on the game
+    # grid with the grid lines and the boundaries over them, as draw_cell draws
+    # the tiles on the grid (so the cells of a locked tetromino, which are not
+    # redrawn, look the same as after a full redraw)
+    def draw_current_tetromino(self):
+        import stddraw
+        if self.current_tetromino is None:
+            return
+        self.current_tetromino.draw()
+        layers = self._layers or self.get_layers()
+        for tile in self.current_tetromino.tiles:
+            x, y = tile.position.x, tile.position.y
+            if self.is_inside(y, x):
+                stddraw.layer(layers["lines"], x - 0.5, y - 0.5, 1, 1)
+                stddraw.layer(layers["boundaries"], x - 0.5, y - 0.5, 1, 1)
+
+    # Method for drawing the inner lines of the grid
+    def draw_grid_lines(self):
+        import stddraw
         stddraw.setPenColor(self.line_color)
         stddraw.setPenRadius(self.line_thickness)
         # x and y ranges for the game grid
@@ -70,6 +211,7 @@ class GameGrid:
 
 
     def draw_boundaries(self):
+        import stddraw
 
         stddraw.setPenColor(self.boundary_color)
         stddraw.setPenRadius(self.box_thickness)
@@ -79,24 +221,37 @@ class GameGrid:
         stddraw.setPenRadius()  # reset the pen radius to its default value
 
 
-    def draw_score(self, score):
+    # Method for drawing the parts of the score panel that do not change
+    def draw_score_panel(self):
+        import stddraw
         stddraw.setPenColor(self.boundary_color)  # using boundary_color
         # set the pen radius
         stddraw.setPenRadius(self.box_thickness)
         # coordinates of the bottom left corner of the game grid
         pos_x, pos_y = self.grid_width - 0.5, -0.5
         stddraw.rectangle(pos_x, pos_y, 3.5, self.grid_height)
-        stddraw.setPenColor(Color(167, 160, 151))
+        stddraw.setPenColor(self.panel_color)
         stddraw.filledRectangle(pos_x + 0.03, pos_y + 0.09, 3.4, self.grid_height - 0.2)
         # set the text
-        text_color = Color(0, 0, 0)
         stddraw.setFontFamily("Arial")
         stddraw.setFontSize(30)
-        stddraw.setPenColor(text_color)
+        stddraw.setPenColor(self.text_color)
         text_to_display = "SCORE"
         text_to_display2 = "NEXT"
         stddraw.text(12 + 1.2, 5, text_to_display2)
         stddraw.text(self.grid_width + 1.2, 15, text_to_display)
+        stddraw.setPenRadius()  # reset the pen radius to its default value
+
+
+    def draw_score(self, score):
+        import stddraw
+        # copy the panel from the background layer over the previous score
+        layers = self._layers or self.get_layers()
+        stddraw.layer(layers["background"], self.grid_width - 0.5, -0.5, 3.5,
+                      self.grid_height)
+        stddraw.setFontFamily("Arial")
+        stddraw.setFontSize(30)
+        stddraw.setPenColor(self.text_color)
         stddraw.text(self.grid_width + 1.2, 14, str(score))
         # get the tetromino's type to create next tetromino to show in the next section
         tet_type = self.current_tetromino.get_type()
@@ -119,7 +274,122 @@ class GameGrid:
         if not self.is_inside(row, col):
             return False
 
-        return self.tile_matrix[row][col] != None
+        return (self.row_masks[row] >> col) & 1 == 1
+
+
+    # Bitmask occupancy of the rows of the grid (one int per row)
+    @property
+    def row_masks(self):
+        if self._row_masks_dirty:
+            self.update_row_masks()
+        return self._row_masks
+
+
+    # Height of each column of the grid (a list of ints, see column_heights)
+    @property
+    def heights(self):
+        if self._heights_dirty:
+            self._heights = column_heights(self.value_matrix).tolist()
+            self._heights_dirty = False
+        return self._heights
+
+
+    # Method for marking the data derived from the value matrix as outdated after
+    # the value matrix has been modified
+    def mark_changed(self):
+        self._row_masks_dirty = True
+        self._heights_dirty = True
+        self._snapshot_values = None
+        self._settled = False
+
+
+    # Method for replacing the value matrix with the given one, the hash of the
+    # grid is updated from the cells that differ
+    def set_values(self, values):
+        self.zobrist_hash = update_zobrist_hash(self.zobrist_hash, self.value_matrix,
+                                                values)
+        self.value_matrix = values
+        self.mark_changed()
+
+
+    # Method for getting the state of the tiles on the grid as an immutable
+    # (bytes of the value matrix, Zobrist hash) pair, the bytes are shared by all
+    # the snapshots taken while the value matrix does not change
+    def snapshot(self):
+        if self._snapshot_values is None:
+            self._snapshot_values = self.value_matrix.tobytes()
+        return self._snapshot_values, self.zobrist_hash
+
+
+    # Method for restoring the tiles on the grid from a snapshot (see snapshot)
+    def restore(self, snapshot):
+        values, zobrist_hash = snapshot
+        self.value_matrix = np.frombuffer(values, dtype=np.uint8).reshape(
+            self.grid_height, self.grid_width).copy()
+        self.mark_changed()
+        self.zobrist_hash = zobrist_hash
+        self._snapshot_values = values
+
+
+    # Method for rebuilding the bitmask rows from the value matrix
+    def update_row_masks(self):
+        # pack the occupied cells of each row into bytes, bit 0 = column 0
+        packed = np.packbits(self.value_matrix != 0, axis=1, bitorder="little")
+        for row in range(self.grid_height):
+            self._row_masks[row] = int.from_bytes(packed[row].tobytes(), "little")
+        self._row_masks_dirty = False
+
+
+    # Method to check if a shape (see Tetromino.get_shape) fits on the grid when
+    # its reference point is at (x, y), cells above the grid are always free
+    def can_place(self, shape, x, y):
+        min_dx, max_dx, rows = shape
+        left = x + min_dx
+        if left < 0 or x + max_dx >= self.grid_width:
+            return False
+        row_masks = self.row_masks
+        for dy, bits in rows:
+            row = y + dy
+            if row < 0:
+                return False
+            if row < self.grid_height and row_masks[row] & (bits << left):
+                return False
+        return True
+
+
+    # Method for getting how far a tetromino can be dropped straight down from
+    # its current position, which is computed from the heights of the columns
+    # below its bottom profile when the tetromino is above all the tiles of its
+    # columns, and by checking each row below it otherwise (e.g. when it is under
+    # an overhang). At most max_distance is returned when it is given.
+    def drop_distance(self, tetromino, max_distance=None):
+        x, y = tetromino.bottom_left_corner.x, tetromino.bottom_left_corner.y
+        heights = self.heights
+        distance = None
+        for dx, dy in tetromino.get_bottom_profile():
+            col, row = x + dx, y + dy
+            if row < heights[col]:
+                distance = None
+                break
+            if distance is None or row - heights[col] < distance:
+                distance = row - heights[col]
+        if distance is None:
+            shape = tetromino.get_shape()
+            distance = 0
+            while (max_distance is None or distance < max_distance) and \
+                    self.can_place(shape, x, y - distance - 1):
+                distance += 1
+        if max_distance is not None:
+            distance = min(distance, max_distance)
+        return distance
+
+
+    # Method for getting the position of the bottom left corner of a tetromino
+    # after it has been dropped straight down (e.g. for drawing a ghost piece
+    # where the tetromino would land)
+    def landing_position(self, tetromino):
+        return Point(tetromino.bottom_left_corner.x,
+                     tetromino.bottom_left_corner.y - self.drop_distance(tetromino))
 
 
     def is_inside(self, row, col):
@@ -137,32 +407,43 @@ class GameGrid:
             for row in range(n_rows):
 
                 if tiles[row][col] != None:
-                    pos = tiles[row][col].get_position()
+                    pos = tiles[row][col].position
                     if self.is_inside(pos.y, pos.x):
-                        self.tile_matrix[pos.y][pos.x] = tiles[row][col]
+                        old = self.value_matrix[pos.y, pos.x]
+                        new = number_to_exponent(tiles[row][col].number)
+                        self.value_matrix[pos.y, pos.x] = new
+                        self.zobrist_hash ^= \
+                            zobrist_key(self.grid_height, self.grid_width,
+                                        pos.y, pos.x, int(old)) ^ \
+                            zobrist_key(self.grid_height, self.grid_width,
+                                        pos.y, pos.x, new)
+                        if pos.y >= self._heights[pos.x]:
+                            self._heights[pos.x] = pos.y + 1
 
                     else:
                         self.game_over = True
 
+        # the heights have been updated with the placed tiles
+        heights_dirty = self._heights_dirty
+        self.mark_changed()
+        self._heights_dirty = heights_dirty
         return self.game_over
 
 
-    def is_full(self, row_n, tile_matrix):
-        z = 0
-        for i in range(self.grid_width):
-            # check is there any empty column in that row
-            if tile_matrix[row_n][i] == None:
-                return False
+    # Method to check if the given row is full (has no empty column)
+    def is_full(self, row_n):
+        return bool(self.value_matrix[row_n].all())
 
-            self.tile_num[z] = tile_matrix[row_n][i].get_number()
-            z += 1
-        # move down each tile by 1, starting from the above of the row
-        for i in range(row_n + 1, self.grid_height):
-            for j in range(self.grid_width):
-                tile_matrix[i - 1][j] = tile_matrix[i][j]
-                if tile_matrix[i][j] != None:
-                    tile_matrix[i][j].move(0, -1)
-        return True
+
+    # Method for clearing all the full rows at once by moving the rows above them
+    # down, returns the tile numbers of the cleared rows (from the bottom up)
+    def clear_full_rows(self):
+        values, full = clear_full_rows(self.value_matrix)
+        if not full.any():
+            return []
+        cleared_rows = exponents_to_numbers(self.value_matrix[full]).tolist()
+        self.set_values(values)
+        return cleared_rows
 
 
     def update_score(self, tile_num):
@@ -172,53 +453,31 @@ class GameGrid:
         return indv_score
 
 
-    def merging(self, tile_matrix):
-        merge = False
-        for a in range(self.grid_width):
-            for b in range(self.grid_height - 1):
-                if tile_matrix[b][a] != None:
-                    if tile_matrix[b + 1][a] != None and tile_matrix[b][a].get_number() == tile_matrix[b + 1][
-                        a].get_number():
-                        tile_matrix[b][a].set_number(2 * tile_matrix[b][a].get_number())
-                        tile_matrix[b][a].set_color()
-                        self.tile_num2[merge] = tile_matrix[b][a].get_number()
-                        merge = True
-                        # to drop the tiles above the merged tiles
-                        for i in range(b + 2, self.grid_height):
-                            tile_matrix[i - 1][a] = tile_matrix[i][a]
-                            if tile_matrix[i][a] != None:
-                                tile_matrix[i][a].move(0, -1)
+    # Method for merging the vertically adjacent tiles with the same number in all
+    # the columns at once (see grid_kernels.merge_pass) until no more tiles can
+    # be merged, returns the numbers of the merged tiles
+    def merging(self):
+        values, merged_exponents = merge_all(self.value_matrix)
+        if merged_exponents:
+            self.set_values(values)
+        return [1 << e for e in merged_exponents]
 
 
+    # Method for dropping all the tiles that are not connected to the bottom of
+    # the grid (through their 4-neighbors) until they land, returns True if any
+    # tile has been dropped
     def connected_4_neighbor(self):
-        # creating a matrix and fill first row with zeros
-        binary_matrix = np.zeros((self.grid_height + 1, self.grid_width), None)
-        binary_matrix[0, :] = 1
-        # fill binary matrix with 1 if there is a tile in that position
-        for col in range(self.grid_width):
-            for row in range(self.grid_height):
-                if self.tile_matrix[row][col] != None:
-                    binary_matrix[row + 1][col] = 1
-        # label the matrix to find out if connected with bottom row
-        labels, num_labels = connected_component_labeling(binary_matrix)
-        x = np.zeros(12)
-        y = np.zeros(12)
-        k = 0
-        for j in range(self.grid_width):
-            for i in range(2, self.grid_height):
-                # if the tile is unconnected
-                if (num_labels != 1 and labels[i][j] != 0 and labels[i][j] != 1):
-                    if self.tile_matrix[i - 2][j] == None:
-                        self.tile_matrix[i - 2][j] = self.tile_matrix[i - 1][j]
-                        if self.tile_matrix[i - 1][j] != None:
-                            self.tile_matrix[i - 1][j].move(0, -1)
-                    # to keep the location of unconnected tile
-                    x[k] = (i - 1)
-                    y[k] = (j)
-                    k += 1
-        # in order not to double the value in 2048 check
-        for a in range(k):
-            self.tile_matrix[int(x[a])][int(y[a])] = None
+        # nothing can be floating if the grid has not changed since the last call
+        if self._settled:
+            return False
+        # flood fill from the bottom row to find the connected tiles
+        supported = find_supported(self.value_matrix)
+        dropped = False
+        if (self.value_matrix != 0).sum() != supported.sum():
+            self.set_values(drop_floating(self.value_matrix, supported))
+            dropped = True
+        self._settled = True
+        return dropped
 
 
 
@@ -316,7 +575,7 @@ def rearrange_min_equivalent_labels(min_equivalent_labels):
     different_labels = set(min_equivalent_labels)
     different_labels_sorted = sorted(different_labels)
 
-    new_labels = np.zeros(max(min_equivalent_labels) + 1, dtype=int)
+    new_labels = np.zeros(max(min_equivalent_labels, default=0) + 1, dtype=int)
     count = 1
     for l in different_labels_sorted:
         # determine the new label
@@ -0,0 +1,209 @@
+import numpy as np  # fundamental Python module for scientific computing
+
+# Vectorized operations on boards stored as integer arrays of tile exponents
+# (0 = empty cell, k = a tile with the number 2 ** k). The row index is the y
+# coordinate on the game grid (row 0 is the bottom row) and any leading axes
+# are treated as a batch of boards, so the same functions are used by a single
+# GameGrid (shape (h, w)) and by a batch of games (shape (b, h, w)).
+
+
+# Converts a tile number (2, 4, 8, ...) to its exponent (1, 2, 3, ...)
+def number_to_exponent(number):
+    return int(number).bit_length() - 1
+
+
+# Converts an array of exponents to the tile numbers (0 for empty cells)
+def exponents_to_numbers(exponents):
+    exponents = np.asarray(exponents, dtype=np.int64)
+    return np.where(exponents > 0, np.left_shift(1, exponents), 0)
+
+
+# Index of each row along the row axis, shaped to broadcast against boards
+def _row_indices(values):
+    height = values.shape[-2]
+    return np.arange(height).reshape(height, 1)
+
+
+# Performs one merging pass on all the columns of the given boards: scanning
+# each column from the bottom, two vertically adjacent tiles with the same
+# number are merged into the lower one and the cells above are moved down by
+# one. A merged tile is not merged again in the same pass, so in a column of
+# equal tiles every second tile is merged into the one below it.
+# Returns the new boards and a boolean mask of the merged (doubled) tiles.
+def merge_pass(values):
+    height = values.shape[-2]
+    rows = _row_indices(values)
+    # equal[..., r, :] is True when the tile at row r + 1 has the same number as
+    # the (non-empty) tile at row r
+    equal = (values[..., 1:, :] == values[..., :-1, :]) & (values[..., :-1, :] != 0)
+    # position of each tile within its run of equal tiles in the column
+    run_start = np.ones(values.shape, dtype=bool)
+    run_start[..., 1:, :] = ~equal
+    start_row = np.maximum.accumulate(np.where(run_start, rows, 0), axis=-2)
+    removed = (rows - start_row) % 2 == 1
+    merged = np.zeros(values.shape, dtype=bool)
+    merged[..., :-1, :] = removed[..., 1:, :]
+    if not removed.any():
+        return values, merged
+    new_values = values + merged.astype(values.dtype)
+    # remove the tiles merged into the ones below them by moving the remaining
+    # cells of each column down (a stable sort puts the removed cells on top)
+    order = np.argsort(removed, axis=-2, kind="stable")
+    new_values = np.take_along_axis(new_values, order, axis=-2)
+    n_removed = removed.sum(axis=-2, keepdims=True)
+    new_values[rows >= height - n_removed] = 0
+    merged = np.take_along_axis(merged, order, axis=-2)
+    return new_values, merged
+
+
+# Repeats merging passes until no more tiles can be merged, which gives the same
+# result as calling the merging pass once for each row of the grid.
+# Returns the new boards and the list of exponents of all the merged tiles.
+def merge_all(values):
+    merged_exponents = []
+    while True:
+        values, merged = merge_pass(values)
+        if not merged.any():
+            return values, merged_exponents
+        merged_exponents.extend(values[merged].tolist())
+
+
+# Repeats merging passes on a batch of boards until no more tiles can be merged,
+# as merge_all does, leaving out of each pass the boards that did not change in
+# the previous one. Returns the new boards.
+def merge_all_batch(values):
+    shape = values.shape
+    values = values.reshape((-1,) + shape[-2:]).copy()
+    # indices of the boards that may still have tiles to merge
+    active = np.arange(len(values))
+    while len(active) > 0:
+        new_values, merged = merge_pass(values[active])
+        changed = merged.any(axis=(1, 2))
+        active = active[changed]
+        values[active] = new_values[changed]
+    return values.reshape(shape)
+
+
+# Removes all the full rows of the given boards in a single pass: the remaining
+# rows are moved down (keeping their order) and empty rows are added on top.
+# Returns the new boards and a boolean mask of the full rows (shape (..., h)).
+def clear_full_rows(values):
+    height = values.shape[-2]
+    full = (values != 0).all(axis=-1)
+    if not full.any():
+        return values, full
+    # a stable sort moves the full rows on top without changing the order of
+    # the other rows, then the moved rows are emptied
+    order = np.argsort(full, axis=-1, kind="stable")
+    new_values = np.take_along_axis(values, order[..., np.newaxis], axis=-2)
+    n_full = full.sum(axis=-1)[..., np.newaxis, np.newaxis]
+    new_values = np.where(_row_indices(values) >= height - n_full, 0, new_values)
+    return new_values.astype(values.dtype), full
+
+
+# Computes the height of each column of the given boards (the row above the
+# highest tile of the column, 0 for an empty column), that is the skyline of
+# the boards. Returns an integer array of shape (..., w)
+def column_heights(values):
+    height = values.shape[-2]
+    occupied = values != 0
+    top = height - np.argmax(np.flip(occupied, axis=-2), axis=-2)
+    return np.where(occupied.any(axis=-2), top, 0)
+
+
+# Applies the game rules to a board after a tetromino has been placed on it, as
+# GameEngine.lock does: the tiles are merged, then all the full rows are cleared
+# at once and the tiles merged again as long as the merges make new rows full,
+# and at last the tiles left floating are dropped.
+# Returns the new board and the sum of the numbers of the cleared tiles (the
+# score of the placement)
+def settle_board(values):
+    values, merged_exponents = merge_all(values)
+    score = 0
+    cleared, full = clear_full_rows(values)
+    while full.any():
+        score += int(exponents_to_numbers(values[full]).sum())
+        values, merged_exponents = merge_all(cleared)
+        cleared, full = clear_full_rows(values)
+    supported = find_supported(values)
+    if (values != 0).sum() != supported.sum():
+        values = drop_floating(values, supported)
+    return values, score
+
+
+# Finds the tiles of a board that are connected to the bottom of the grid
+# through their 4-neighbors with a single flood fill starting from the tiles on
+# the bottom row, so each cell is visited at most once.
+# Returns a boolean array of the supported tiles.
+def find_supported(values):
+    height, width = values.shape
+    occupied = (values != 0).tolist()
+    supported = [[False] * width for row in range(height)]
+    stack = []
+    for col in range(width):
+        if occupied[0][col]:
+            supported[0][col] = True
+            stack.append((0, col))
+    while stack:
+        row, col = stack.pop()
+        for n_row, n_col in ((row + 1, col), (row - 1, col), (row, col - 1), (row, col + 1)):
+            if 0 <= n_row < height and 0 <= n_col < width and \
+                    occupied[n_row][n_col] and not supported[n_row][n_col]:
+                supported[n_row][n_col] = True
+                stack.append((n_row, n_col))
+    return np.array(supported, dtype=bool).reshape(values.shape)
+
+
+# Finds the supported tiles (see find_supported) of a batch of boards at once by
+# growing the supported tiles to their occupied 4-neighbors until they do not
+# change. Each vectorized step also adds the whole vertical run of tiles around
+# each supported tile, so the number of steps is about the number of turns of
+# the longest path from the bottom row rather than its length, and the boards
+# that stopped changing are left out of the next steps.
+def find_supported_batch(values):
+    shape = values.shape
+    height = shape[-2]
+    occupied = (values != 0).reshape((-1,) + shape[-2:])
+    rows = np.arange(height, dtype=np.int16).reshape(height, 1)
+    # the rows of the nearest empty cells below and above each cell in its
+    # column (-1 and height at the bottom and the top of the grid), the tiles
+    # between them make the vertical run of the cell
+    empty_below = np.maximum.accumulate(np.where(occupied, -1, rows), axis=-2)
+    empty_above = np.minimum.accumulate(
+        np.where(occupied, height, rows)[:, ::-1], axis=-2)[:, ::-1]
+    supported = np.zeros(occupied.shape, dtype=bool)
+    supported[:, 0, :] = occupied[:, 0, :]
+    # indices of the boards whose supported tiles may still change
+    active = np.arange(len(occupied))
+    while len(active) > 0:
+        current = supported[active]
+        grown = current.copy()
+        grown[:, 1:, :] |= current[:, :-1, :]
+        grown[:, :-1, :] |= current[:, 1:, :]
+        grown[:, :, 1:] |= current[:, :, :-1]
+        grown[:, :, :-1] |= current[:, :, 1:]
+        grown &= occupied[active]
+        # a tile is supported when a supported tile is in its vertical run
+        below = np.maximum.accumulate(np.where(grown, rows, -1), axis=-2)
+        above = np.minimum.accumulate(
+            np.where(grown, rows, height)[:, ::-1], axis=-2)[:, ::-1]
+        grown |= occupied[active] & ((below > empty_below[active]) |
+                                     (above < empty_above[active]))
+        changed = (grown != current).any(axis=(1, 2))
+        supported[active] = grown
+        active = active[changed]
+    return supported.reshape(shape)
+
+
+# Drops every tile that is not supported all the way down its column, until it
+# lands on a supported tile, on another dropped tile or on the bottom of the
+# grid. The supported tiles stay where they are and the dropped tiles keep
+# their order in each column, so after one call all the tiles are supported.
+def drop_floating(values, supported):
+    # the supported tiles split each column into segments, in each segment the
+    # unsupported tiles are moved below the empty cells by a stable sort on
+    # (segment, 0 = supported / 1 = unsupported / 2 = empty)
+    segment = np.cumsum(supported, axis=-2)
+    kind = np.where(supported, 0, np.where(values != 0, 1, 2))
+    order = np.argsort(3 * segment + kind, axis=-2, kind="stable")
+    return np.take_along_axis(values, order, axis=-2)
@@ -0,0 +1,109 @@
+from collections import deque  # queue of the breadth-first search
+from tetromino import ROTATIONS, SHAPES, KICKS  # tetromino shapes and kicks
+
+
+# Class used for representing a final resting placement of a tetromino: the
+# position of its bottom left corner, its rotation (index in ROTATIONS), the
+# shortest list of moves ("left", "right", "down", "up" = rotate) that takes the
+# tetromino there from where it is, and the (col, row, number) cells of its tiles
+class Placement:
+    def __init__(self, x, y, rotation, path, cells):
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.path = path
+        self.cells = cells
+
+    def __repr__(self):
+        return "Placement(x=%d, y=%d, rotation=%d, path=%r)" % (
+            self.x, self.y, self.rotation, self.path)
+
+
+# Finds every distinct final resting placement of the given tetromino on the
+# given game grid that can be reached from its current position with left, right,
+# down and rotate moves (with the same wall kicks as Tetromino.rotateTetromino),
+# including slides and tucks under overhangs. The moves are applied without
+# gravity, that is all the moves of a path can be applied in a single tick (see
+# GameEngine.tick). Two placements are the same when they put the same numbers
+# on the same cells. The search is a breadth-first search over the (x, y,
+# rotation) states of the tetromino, so each state is checked at most once and
+# each path is as short as possible.
+# Returns the list of the placements (see Placement)
+def find_placements(game_grid, tetromino):
+    width, height = game_grid.grid_width, game_grid.grid_height
+    row_masks = game_grid.row_masks
+    shapes = SHAPES[tetromino.type]
+    numbers = [tile.number for tile in tetromino.tiles]
+    # the states are encoded as integers, x > -4 and y > -4 for any tetromino
+    # that fits on the grid
+    def encode(x, y, rotation):
+        return ((y + 4) * (width + 8) + x + 4) * 4 + rotation
+
+    # fits[state] caches whether the tetromino fits in a state
+    fits = {}
+
+    def can_place(x, y, rotation):
+        state = encode(x, y, rotation)
+        result = fits.get(state)
+        if result is None:
+            min_dx, max_dx, rows = shapes[rotation]
+            left = x + min_dx
+            result = 0 <= left and x + max_dx < width
+            if result:
+                for dy, bits in rows:
+                    row = y + dy
+                    if row < 0 or (row < height and row_masks[row] & (bits << left)):
+                        result = False
+                        break
+            fits[state] = result
+        return result
+
+    x, y, rotation = tetromino.bottom_left_corner.x, tetromino.bottom_left_corner.y, \
+        tetromino.rotation
+    if not can_place(x, y, rotation):
+        return []
+    # parents[state] = (previous state, move) for reconstructing the paths
+    start = encode(x, y, rotation)
+    parents = {start: None}
+    queue = deque([(x, y, rotation, start)])
+    placements = []
+    seen_placements = set()
+    while queue:
+        x, y, rotation, state = queue.popleft()
+        # the states reachable with one move
+        moves = [("left", x - 1, y, rotation), ("right", x + 1, y, rotation)]
+        resting = not can_place(x, y - 1, rotation)
+        if not resting:
+            moves.append(("down", x, y - 1, rotation))
+        next_rotation = (rotation + 1) % 4
+        for dx, dy in KICKS:
+            if can_place(x + dx, y + dy, next_rotation):
+                moves.append(("up", x + dx, y + dy, next_rotation))
+                break
+        for move, n_x, n_y, n_rotation in moves:
+            if move != "up" and move != "down" and not can_place(n_x, n_y, n_rotation):
+                continue
+            n_state = encode(n_x, n_y, n_rotation)
+            if n_state not in parents:
+                parents[n_state] = (state, move)
+                queue.append((n_x, n_y, n_rotation, n_state))
+        if resting:
+            cells = tuple((x + dx, y + dy, number) for (dx, dy), number
+                          in zip(ROTATIONS[tetromino.type][rotation], numbers))
+            key = frozenset(cells)
+            if key not in seen_placements:
+                seen_placements.add(key)
+                placements.append(Placement(x, y, rotation, get_path(parents, state),
+                                            cells))
+    return placements
+
+
+# Reconstructs the moves taking the tetromino from the start of the search to
+# the given state
+def get_path(parents, state):
+    path = []
+    while parents[state] is not None:
+        state, move = parents[state]
+        path.append(move)
+    path.reverse()
+    return path
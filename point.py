@@ -1,4 +1,7 @@
 class Point:
+   # the coordinates are stored in slots (no __dict__ per point)
+   __slots__ = ("x", "y")
+
    # constructor that creates a point at the given (x, y) location
    # default values for the given location are set as x = 0 and y = 0
    def __init__(self, x = 0, y = 0):
@@ -0,0 +1,297 @@
+import hashlib  # used for hashing the boards
+from engine import GameEngine  # runs the game rules (headless)
+
+# Games are recorded as compact binary replays: the seed of the game and the
+# actions applied in each simulation tick (see GameEngine.tick) are enough to
+# play the game again exactly. A replay is made of:
+#
+#    MAGIC
+#    varint version, seed, grid height, grid width, gravity ticks
+#    varint entries, one per action: (gap << 3) | code
+#    varint end entry: (gap << 3) | 0
+#
+# where code is the index of the action in ACTION_CODES and gap is the number
+# of ticks since the tick of the previous entry (the ticks without actions are
+# not recorded, several actions in the same tick have a gap of 0). The gap of
+# the end entry gives the number of ticks after the last action, so the total
+# number of ticks is known. Varints are unsigned LEB128 integers (7 bits per
+# byte, lowest bits first, the high bit is set on all the bytes but the last).
+
+# first bytes of a replay
+MAGIC = b"T2048R"
+# version of the replay format
+VERSION = 1
+# actions in the order of their codes (0 is used for the end entry)
+ACTION_CODES = (None,) + GameEngine.actions
+# number of bits used for the action code in an entry
+CODE_BITS = 3
+# smallest and largest grid height and width accepted in a replay (the game is
+# played on a 20 x 12 grid)
+MIN_GRID_SIZE = 4
+MAX_GRID_SIZE = 64
+
+
+# Appends the varint encoding of a non-negative integer to a bytearray
+def write_varint(buffer, value):
+    if value < 0:
+        raise ValueError("varints cannot be negative: %d" % value)
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+# Reads a varint from data at the given position, returns the value and the
+# position of the next byte
+def read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError("truncated replay")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+# Class used for recording the actions of a game as a replay while it is being
+# played, the recorder is attached to the engine with start_recording
+class ReplayRecorder:
+    # Constructor that starts the replay of a game with the given parameters
+    def __init__(self, seed, grid_h, grid_w, gravity_ticks):
+        self.data = bytearray(MAGIC)
+        for value in (VERSION, seed, grid_h, grid_w, gravity_ticks):
+            write_varint(self.data, value)
+        # number of ticks recorded and the tick of the last recorded action
+        self.ticks = 0
+        self.last_action_tick = 0
+
+    # Method for recording the actions applied in the next tick, raises
+    # ValueError (before anything is recorded) when one of them is not a game
+    # action
+    def record_tick(self, actions):
+        codes = []
+        for action in actions:
+            if action is None or action not in ACTION_CODES:
+                raise ValueError("unknown action: %r" % (action,))
+            codes.append(ACTION_CODES.index(action))
+        for code in codes:
+            gap = self.ticks - self.last_action_tick
+            write_varint(self.data, (gap << CODE_BITS) | code)
+            self.last_action_tick = self.ticks
+        self.ticks += 1
+
+    # Method for recording n ticks without actions
+    def record_idle_ticks(self, n):
+        self.ticks += n
+
+    # Method for getting the replay of the ticks recorded so far
+    def to_bytes(self):
+        data = bytearray(self.data)
+        write_varint(data, (self.ticks - self.last_action_tick) << CODE_BITS)
+        return bytes(data)
+
+    # Method for saving the replay of the ticks recorded so far to a file
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+
+# Starts recording the game played on the given engine, which must not have
+# been ticked yet, returns the recorder
+def start_recording(engine):
+    if engine.ticks != 0:
+        raise ValueError("the game has already started")
+    engine.recorder = ReplayRecorder(engine.seed, engine.grid_height,
+                                     engine.grid_width, engine.gravity_ticks)
+    return engine.recorder
+
+
+# Reads the header of a replay, returns a dictionary of the game parameters and
+# the position of the first entry
+def read_header(data):
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a replay")
+    position = len(MAGIC)
+    header = {}
+    for name in ("version", "seed", "grid_h", "grid_w", "gravity_ticks"):
+        header[name], position = read_varint(data, position)
+    if header["version"] != VERSION:
+        raise ValueError("unsupported replay version: %d" % header["version"])
+    for name in ("grid_h", "grid_w"):
+        if not MIN_GRID_SIZE <= header[name] <= MAX_GRID_SIZE:
+            raise ValueError("invalid %s in replay: %d" % (name, header[name]))
+    if header["gravity_ticks"] < 1:
+        raise ValueError("invalid gravity_ticks in replay: %d" % header["gravity_ticks"])
+    return header, position
+
+
+# Generates the runs of ticks of a replay as (idle, actions) pairs: idle ticks
+# without actions followed by a tick with the given actions (a tuple), the last
+# run has no actions and ends the replay
+def iter_runs(data):
+    header, position = read_header(data)
+    idle = 0
+    actions = []
+    while True:
+        entry, position = read_varint(data, position)
+        gap, code = entry >> CODE_BITS, entry & ((1 << CODE_BITS) - 1)
+        if code >= len(ACTION_CODES):
+            raise ValueError("invalid action code: %d" % code)
+        # the ticks before the tick of the entry are over
+        if gap > 0:
+            if actions:
+                yield idle, tuple(actions)
+                idle, actions = gap - 1, []
+            else:
+                idle += gap
+        if code == 0:
+            break
+        actions.append(ACTION_CODES[code])
+    if position != len(data):
+        raise ValueError("unexpected data after the end of the replay")
+    yield idle, ()
+
+
+# Generates the actions of each tick of a replay as tuples (one tuple per tick)
+def iter_ticks(data):
+    for idle, actions in iter_runs(data):
+        for i in range(idle):
+            yield ()
+        if actions:
+            yield actions
+
+
+# Creates the engine of the game recorded in a replay, ready to be ticked
+def create_engine(data):
+    header, position = read_header(data)
+    return GameEngine(header["grid_h"], header["grid_w"], header["gravity_ticks"],
+                      header["seed"])
+
+
+# Plays a replay headless as fast as possible (the ticks without actions only
+# run their gravity steps) and returns the engine at the end of the game
+def play_replay(data):
+    engine = create_engine(data)
+    for idle, actions in iter_runs(data):
+        engine.idle_ticks(idle)
+        if actions:
+            engine.tick(actions)
+    return engine
+
+
+# Returns a short hash (as a hex string) of the tiles on the board of a game,
+# used for checking that a replay ends with the reported board
+def board_hash(engine):
+    values = engine.grid.value_matrix
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(bytes(values.shape))
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+# Plays a replay and checks that it ends with the given score and board hash
+# (each check is skipped when the value is None), returns a dictionary of the
+# results with "ok" set to False if a check failed
+def verify_replay(data, score=None, board=None):
+    engine = play_replay(data)
+    result = {"score": engine.score, "board_hash": board_hash(engine),
+              "pieces": engine.pieces_placed, "ticks": engine.ticks,
+              "game_over": engine.game_over}
+    result["ok"] = (score is None or score == engine.score) and \
+        (board is None or board == result["board_hash"])
+    return result
+
+
+# Returns the keyframe of the state of a game played on the given engine, that
+# is everything needed to go on with the game from its current tick (see
+# restore_keyframe). Keyframes are the snapshots of the engine (see
+# GameEngine.snapshot), so consecutive keyframes share the unchanged parts.
+def make_keyframe(engine):
+    return engine.snapshot()
+
+
+# Creates the engine of the game recorded in a replay in the state saved in the
+# given keyframe of the game
+def restore_keyframe(data, keyframe):
+    engine = create_engine(data)
+    engine.restore(keyframe)
+    return engine
+
+
+# Class used for jumping to any piece of a recorded game without playing it
+# from the start: the replay is played once and a keyframe (see make_keyframe)
+# is kept every `every` pieces with the position of the replay it was taken at,
+# then the game at piece n is restored from the last keyframe before it and
+# played from that position, so a seek only plays the ticks after the keyframe
+class ReplayIndex:
+    # Constructor that plays the given replay and builds its keyframe index
+    def __init__(self, data, every=10):
+        self.data = data
+        self.every = every
+        # the (idle, actions) runs of the replay (see iter_runs)
+        self.runs = list(iter_runs(data))
+        engine = create_engine(data)
+        # the keyframes and the positions of the replay they were taken at
+        self.keyframes = [make_keyframe(engine)]
+        self.positions = [(0, 0)]
+        for position in self.play(engine):
+            self.add_keyframe(engine, position)
+        # the state at the end of the game
+        self.final = make_keyframe(engine)
+
+    # Generator that plays the runs of the replay on the given engine from the
+    # given position, that is the index of a run and the number of its idle
+    # ticks already played. The idle ticks are fast-forwarded to each gravity
+    # step (see GameEngine.idle_ticks). The position is generated after each
+    # gravity step and after each tick with actions, which are the only ticks in
+    # which a piece can be placed.
+    def play(self, engine, run=0, played=0):
+        for run in range(run, len(self.runs)):
+            idle, actions = self.runs[run]
+            while played < idle and not engine.game_over:
+                n = min(idle - played, engine.ticks_to_gravity)
+                engine.idle_ticks(n)
+                played += n
+                yield run, played
+            engine.idle_ticks(idle - played)
+            played = 0
+            if actions:
+                engine.tick(actions)
+                yield run + 1, 0
+
+    # Method for adding a keyframe of the game at the given position if `every`
+    # pieces have been placed since the last keyframe
+    def add_keyframe(self, engine, position):
+        if engine.pieces_placed >= self.keyframes[-1].pieces_placed + self.every:
+            self.keyframes.append(make_keyframe(engine))
+            self.positions.append(position)
+
+    # Method for getting the engine of the game at the first tick after piece n
+    # has been placed (n = 0 for the start of the game), or at the end of the
+    # game if fewer pieces have been placed
+    def engine_at_piece(self, n):
+        if n >= self.final.pieces_placed:
+            return restore_keyframe(self.data, self.final)
+        # the last keyframe at or before piece n
+        index = 0
+        for i, keyframe in enumerate(self.keyframes):
+            if keyframe.pieces_placed > n:
+                break
+            index = i
+        engine = restore_keyframe(self.data, self.keyframes[index])
+        # play the replay from the position of the keyframe
+        if engine.pieces_placed < n:
+            for position in self.play(engine, *self.positions[index]):
+                if engine.pieces_placed >= n:
+                    break
+        return engine
+
+
+# Loads a replay from a file
+def load_replay(path):
+    with open(path, "rb") as file:
+        return file.read()
@@ -1,8 +1,11 @@
 import time
 import os
+import math
 import sys
 import color
 import string
+from collections import OrderedDict
+from collections import deque
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -67,11 +70,30 @@ _canvasWidth = float(_DEFAULT_CANVAS_SIZE)
 _canvasHeight = float(_DEFAULT_CANVAS_SIZE)
 _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
-_keysTyped = []
+
+# Queue of the events (keys typed and mouse clicks) that have not been
+# read yet, oldest first, as (time, kind, value) tuples (see nextEvent())
+_events = deque()
+
+# Surfaces the drawing functions drew on before beginLayer() was called
+_layerParents = []
+
+# Incremented whenever the canvas size or scale changes
+_scaleVersion = 0
+
+# Rectangles of the background canvas changed since the window canvas
+# was last updated (see markDirty() and showDirty())
+_dirtyRects = []
 
 # Has the window been created?
 _windowCreated = False
 
+# Maximum numbers of font objects and rendered strings kept in the caches
+_FONT_CACHE_SIZE = 32
+_TEXT_CACHE_SIZE = 1024
+# Maximum number of pre-rendered sprites kept in the sprite cache
+_SPRITE_CACHE_SIZE = 256
+
 # -----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 # -----------------------------------------------------------------------
@@ -89,17 +111,82 @@ _mousePos = None
 # End added by Alan J. Broder
 # -----------------------------------------------------------------------
 
+# -----------------------------------------------------------------------
+
+class _LruCache:
+    """
+    A _LruCache object maps keys to values and keeps at most maxSize
+    of them, evicting the least recently used entry when it is full.
+    It counts the lookups that found (hits) or missed (misses) a key.
+    """
+
+    def __init__(self, maxSize):
+        self._maxSize = maxSize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the value cached for key, or None if there is none.
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Cache value for key, evicting the least recently used entry
+        if the cache is full.
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxSize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the entries and reset the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Return a dict with the hits, misses and size of self.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxSize': self._maxSize}
+
+
+# Font objects keyed by (family, size, bold) and rendered text surfaces
+# keyed by (family, size, bold, string, color).
+_fontCache = _LruCache(_FONT_CACHE_SIZE)
+_textCache = _LruCache(_TEXT_CACHE_SIZE)
+
+# Pre-rendered sprite surfaces keyed by (key, width, height) in pixels,
+# emptied whenever the canvas size or scale changes.
+_spriteCache = _LruCache(_SPRITE_CACHE_SIZE)
+
+
 # -----------------------------------------------------------------------
 
 def _pygameColor(c):
     """
     Convert c, an object of type color.Color, to an equivalent object
-    of type pygame.Color.  Return the result.
+    of type pygame.Color.  Return the result, which is cached on c so
+    that c is converted only once. The result must not be modified.
     """
-    r = c.getRed()
-    g = c.getGreen()
-    b = c.getBlue()
-    return pygame.Color(r, g, b)
+    pygameColor = c.getPygameColor()
+    if pygameColor is None:
+        pygameColor = pygame.Color(c.getRed(), c.getGreen(), c.getBlue())
+        c.setPygameColor(pygameColor)
+    return pygameColor
 
 
 # -----------------------------------------------------------------------
@@ -160,6 +247,7 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
 
     _canvasWidth = w
     _canvasHeight = h
+    _scaleChanged()
     _background = pygame.display.set_mode([w, h])
     pygame.display.set_caption('stddraw window (r-click to save)')
     _surface = pygame.Surface((w, h))
@@ -181,6 +269,7 @@ def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     size = max - min
     _xmin = min - _BORDER * size
     _xmax = max + _BORDER * size
+    _scaleChanged()
 
 
 def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
@@ -197,6 +286,25 @@ def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     size = max - min
     _ymin = min - _BORDER * size
     _ymax = max + _BORDER * size
+    _scaleChanged()
+
+
+def _scaleChanged():
+    """
+    Forget everything rendered for the previous canvas size or scale.
+    """
+    global _scaleVersion
+    _scaleVersion += 1
+    _spriteCache.clear()
+
+
+def scaleVersion():
+    """
+    Return a number that changes whenever the canvas size or scale
+    changes, such that anything rendered in advance can be rendered
+    again for the new size or scale.
+    """
+    return _scaleVersion
 
 
 def setPenRadius(r=_DEFAULT_PEN_RADIUS):
@@ -479,6 +587,34 @@ def filledPolygon(x, y):
     pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
 
 
+def _getFont(family, size, bold):
+    """
+    Return the font object for the given family, size and boldness,
+    creating it only if it is not in the font cache.
+    """
+    key = (family, size, bold)
+    font = _fontCache.get(key)
+    if font is None:
+        font = pygame.font.SysFont(family, size, bold)
+        _fontCache.put(key, font)
+    return font
+
+
+def _renderText(s, bold):
+    """
+    Return a surface with string s rendered with the current font and
+    pen color, rendering it only if it is not in the text cache.
+    """
+    c = _penColor
+    key = (_fontFamily, _fontSize, bold, s, c)
+    text = _textCache.get(key)
+    if text is None:
+        font = _getFont(_fontFamily, _fontSize, bold)
+        text = font.render(s, 1, _pygameColor(c))
+        _textCache.put(key, text)
+    return text
+
+
 def text(x, y, s):
     """
     Draw string s on the background canvas centered at (x, y).
@@ -488,8 +624,7 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, False)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -503,12 +638,134 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, True)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
 
+def sprite(key, x, y, r, drawFunction):
+    """
+    Draw on the background canvas the sprite identified by key, which
+    is a square whose sides are of length 2r, centered on (x, y). The
+    first time the sprite is needed at the current scale it is rendered
+    to an offscreen surface by calling drawFunction(0.0, 0.0), which
+    must draw the content of the sprite centered on (0, 0) with the
+    usual drawing functions. Later calls only copy that surface.
+    """
+    global _surface
+    global _canvasWidth
+    global _canvasHeight
+    global _xmin
+    global _xmax
+    global _ymin
+    global _ymax
+    _makeSureWindowCreated()
+    x = float(x)
+    y = float(y)
+    ws = int(math.ceil(_factorX(2.0 * r)))
+    hs = int(math.ceil(_factorY(2.0 * r)))
+    cacheKey = (key, ws, hs)
+    spriteSurface = _spriteCache.get(cacheKey)
+    if spriteSurface is None:
+        spriteSurface = pygame.Surface((ws, hs), pygame.SRCALPHA)
+        # Temporarily draw on the sprite surface, with the scale changed
+        # such that (0, 0) is at its center and the units are unchanged.
+        saved = (_surface, _canvasWidth, _canvasHeight,
+                 _xmin, _xmax, _ymin, _ymax)
+        halfW = ws / 2.0 * (_xmax - _xmin) / _canvasWidth
+        halfH = hs / 2.0 * (_ymax - _ymin) / _canvasHeight
+        _surface = spriteSurface
+        _canvasWidth, _canvasHeight = ws, hs
+        _xmin, _xmax, _ymin, _ymax = -halfW, halfW, -halfH, halfH
+        try:
+            drawFunction(0.0, 0.0)
+        finally:
+            (_surface, _canvasWidth, _canvasHeight,
+             _xmin, _xmax, _ymin, _ymax) = saved
+        _spriteCache.put(cacheKey, spriteSurface)
+    # Copy the sprite to the pixels between the rounded edges of the
+    # square, such that adjacent sprites never overlap.
+    left = int(round(_scaleX(x - r)))
+    top = int(round(_scaleY(y + r)))
+    right = int(round(_scaleX(x + r)))
+    bottom = int(round(_scaleY(y - r)))
+    _surface.blit(spriteSurface, (left, top),
+                  pygame.Rect(0, 0, right - left, bottom - top))
+
+
+def beginLayer(opaque=False):
+    """
+    Make the drawing functions draw on a new layer with the size of the
+    canvas, instead of on the background canvas, until endLayer() is
+    called. The layer is transparent where nothing is drawn on it, unless
+    opaque is True, in which case drawing it is faster but it covers
+    everything under it.
+    """
+    global _surface
+    _makeSureWindowCreated()
+    _layerParents.append(_surface)
+    if opaque:
+        _surface = pygame.Surface(_surface.get_size())
+    else:
+        _surface = pygame.Surface(_surface.get_size(), pygame.SRCALPHA)
+
+
+def endLayer():
+    """
+    Stop drawing on the layer created by the last call of beginLayer()
+    and return it, such that it can be drawn with layer().
+    """
+    global _surface
+    if _surface.get_flags() & pygame.SRCALPHA:
+        drawnLayer = _surface.convert_alpha()
+    else:
+        drawnLayer = _surface.convert()
+    _surface = _layerParents.pop()
+    return drawnLayer
+
+
+def layer(l, x=None, y=None, w=None, h=None):
+    """
+    Draw layer l (returned by endLayer()) on the background canvas. If
+    x, y, w and h are given, then draw only the part of l in the
+    rectangle of width w and height h whose lower left point is (x, y),
+    using the same pixels as sprite() for such a square.
+    """
+    _makeSureWindowCreated()
+    if x is None:
+        _surface.blit(l, (0, 0))
+        return
+    left = int(round(_scaleX(float(x))))
+    top = int(round(_scaleY(float(y) + h)))
+    right = int(round(_scaleX(float(x) + w)))
+    bottom = int(round(_scaleY(float(y))))
+    rect = pygame.Rect(left, top, right - left, bottom - top)
+    _surface.blit(l, rect, rect)
+
+
+def spriteCacheStats():
+    """
+    Return a dict with the hits, misses and size of the sprite cache.
+    """
+    return _spriteCache.stats()
+
+
+def textCacheStats():
+    """
+    Return a dict with the hits, misses and sizes of the font cache
+    (key 'fonts') and of the rendered text cache (key 'texts').
+    """
+    return {'fonts': _fontCache.stats(), 'texts': _textCache.stats()}
+
+
+def clearTextCaches():
+    """
+    Remove all the cached fonts and rendered texts.
+    """
+    _fontCache.clear()
+    _textCache.clear()
+
+
 def picture(pic, x=None, y=None):
     """
     Draw pic on the background canvas centered at (x, y).  pic is an
@@ -566,8 +823,10 @@ def _show():
     """
     Copy the background canvas to the window canvas.
     """
+    global _dirtyRects
     _background.blit(_surface, (0, 0))
     pygame.display.flip()
+    _dirtyRects = []
     _checkForEvents()
 
 
@@ -594,8 +853,46 @@ def show(msec=float('inf')):
 
     _makeSureWindowCreated()
     _show()
+    _wait(msec)
+
+
+def markDirty(x, y, w, h):
+    """
+    Mark the rectangle of width w and height h whose lower left point
+    is (x, y) as changed, such that the next call of showDirty()
+    copies it to the window canvas.
+    """
+    _makeSureWindowCreated()
+    xs = _scaleX(float(x))
+    ys = _scaleY(float(y))
+    ws = _factorX(float(w))
+    hs = _factorY(float(h))
+    # Add a pixel on each side for the rounding of the drawn shapes.
+    rect = pygame.Rect(int(xs) - 1, int(ys - hs) - 1,
+                       int(math.ceil(ws)) + 3, int(math.ceil(hs)) + 3)
+    _dirtyRects.append(rect.clip(_surface.get_rect()))
+
+
+def showDirty(msec=0.0):
+    """
+    Copy only the rectangles marked with markDirty() since the last
+    call of show() or showDirty() from the background canvas to the
+    window canvas, and then wait for msec milliseconds.
+    """
+    global _dirtyRects
+    _makeSureWindowCreated()
+    for rect in _dirtyRects:
+        _background.blit(_surface, rect, rect)
+    pygame.display.update(_dirtyRects)
+    _dirtyRects = []
     _checkForEvents()
+    _wait(msec)
+
 
+def _wait(msec):
+    """
+    Wait for msec milliseconds.
+    """
     # Sleep for the required time, but check for events every
     # QUANTUM seconds.
     QUANTUM = .01
@@ -659,7 +956,6 @@ def _checkForEvents():
     pressed).  If a key has been typed, then put that key in a queue.
     """
     global _surface
-    global _keysTyped
 
     # -------------------------------------------------------------------
     # Begin added by Alan J. Broder
@@ -672,11 +968,13 @@ def _checkForEvents():
 
     _makeSureWindowCreated()
 
+    # All the events read at once get the same time stamp
+    now = time.monotonic()
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
         elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
+            _events.append((now, 'key', pygame.key.name(event.key)))
         elif (event.type == pygame.MOUSEBUTTONUP) and \
                 (event.button == 3):
             _saveToFile()
@@ -690,22 +988,85 @@ def _checkForEvents():
                 (event.button == 1):
             _mousePressed = True
             _mousePos = event.pos
+            _events.append((now, 'mouse',
+                            (_userX(event.pos[0]), _userY(event.pos[1]))))
             # ---------------------------------------------------------------
         # End added by Alan J. Broder
         # ---------------------------------------------------------------
 
 
+# -----------------------------------------------------------------------
+
+# Functions for retrieving events
+
+def pollEvents():
+    """
+    Check once for new events (keys typed and mouse clicks) and add
+    them to the event queue, without drawing or waiting. A program that
+    does not call show() often, such as a game loop, should call this
+    function once per iteration.
+    """
+    _checkForEvents()
+
+
+def hasNextEvent():
+    """
+    Return True if the event queue is not empty. Otherwise return
+    False.
+    """
+    return len(_events) > 0
+
+
+def nextEvent():
+    """
+    Remove the oldest event from the event queue, and return it as a
+    (time, kind, value) tuple: time is the time.monotonic() value of
+    when the event was read, kind is 'key' for a key typed (value is
+    the name of the key) or 'mouse' for a left mouse click (value is
+    the (x, y) position of the click in user space).
+    """
+    return _events.popleft()
+
+
+def nextEvents():
+    """
+    Remove all the events from the event queue, and return them as a
+    list of (time, kind, value) tuples (see nextEvent()), oldest first.
+    """
+    events = list(_events)
+    _events.clear()
+    return events
+
+
+def clearEvents():
+    """
+    Clear all the events in the event queue.
+    """
+    _events.clear()
+
+
 # -----------------------------------------------------------------------
 
 # Functions for retrieving keys
 
+def _skipToKeyTyped():
+    """
+    Remove the events that are not keys typed from the front of the
+    event queue.
+    """
+    while _events and _events[0][1] != 'key':
+        _events.popleft()
+
+
 def hasNextKeyTyped():
     """
     Return True if the queue of the keys the user typed is not empty.
-    Otherwise return False.
+    Otherwise return False. The mouse clicks in front of the next key
+    are removed from the event queue (they are still available through
+    mousePressed(), mouseX() and mouseY()).
     """
-    global _keysTyped
-    return _keysTyped != []
+    _skipToKeyTyped()
+    return len(_events) > 0
 
 
 def nextKeyTyped():
@@ -713,16 +1074,16 @@ def nextKeyTyped():
     Remove the first key from the queue of the keys that the user typed,
     and return that key.
     """
-    global _keysTyped
-    return _keysTyped.pop()
+    _skipToKeyTyped()
+    return _events.popleft()[2]
 
 
 def clearKeysTyped():
     """
     Clear all the keys in the queue of the keys that the user typed.
     """
-    global _keysTyped
-    _keysTyped = []
+    global _events
+    _events = deque(event for event in _events if event[1] != 'key')
 
 
 # -----------------------------------------------------------------------
@@ -3,70 +3,99 @@ from tile import Tile  # used for representing each tile on the tetromino
 from point import Point  # used for tile positions
 import numpy as np  # fundamental Python module for scientific computing
 import copy as cp
-import math
+
+
+# Offsets (dx, dy) of the tiles of each tetromino type relative to its bottom
+# left corner in each of the 4 rotations (clockwise, starting from the initial
+# orientation). The tiles are listed in the same order in all the rotations, so
+# each tile keeps its number while the tetromino rotates, and the i-th tile is
+# the i-th occupied cell of the tile matrix (in row-major order).
+ROTATIONS = {
+    'I': (((0, 3), (0, 2), (0, 1), (0, 0)),
+          ((0, 2), (1, 2), (2, 2), (3, 2)),
+          ((1, 0), (1, 1), (1, 2), (1, 3)),
+          ((3, 2), (2, 2), (1, 2), (0, 2))),
+    'O': (((0, 1), (1, 1), (0, 0), (1, 0)),
+          ((1, 1), (1, 0), (0, 1), (0, 0)),
+          ((1, 0), (0, 0), (1, 1), (0, 1)),
+          ((0, 0), (0, 1), (1, 0), (1, 1))),
+    'Z': (((0, 2), (1, 2), (1, 1), (2, 1)),
+          ((2, 2), (2, 1), (1, 1), (1, 0)),
+          ((2, 0), (1, 0), (1, 1), (0, 1)),
+          ((0, 0), (0, 1), (1, 1), (1, 2))),
+    'L': (((0, 2), (1, 2), (2, 2), (0, 1)),
+          ((1, 1), (1, 0), (1, -1), (0, 1)),
+          ((0, 0), (-1, 0), (-2, 0), (0, 1)),
+          ((-1, 1), (-1, 2), (-1, 3), (0, 1))),
+    'J': (((0, 2), (1, 2), (2, 2), (2, 1)),
+          ((3, 3), (3, 2), (3, 1), (2, 1)),
+          ((4, 0), (3, 0), (2, 0), (2, 1)),
+          ((1, -1), (1, 0), (1, 1), (2, 1))),
+    'S': (((1, 2), (2, 2), (0, 1), (1, 1)),
+          ((2, 1), (2, 0), (1, 2), (1, 1)),
+          ((1, 0), (0, 0), (2, 1), (1, 1)),
+          ((0, 1), (0, 2), (1, 0), (1, 1))),
+    'T': (((0, 2), (1, 2), (2, 2), (1, 1)),
+          ((2, 2), (2, 1), (2, 0), (1, 1)),
+          ((2, 0), (1, 0), (0, 0), (1, 1)),
+          ((0, 0), (0, 1), (0, 2), (1, 1))),
+}
+
+# Size of the (square) tile matrix of each tetromino type
+MATRIX_SIZES = {'I': 4, 'O': 2, 'Z': 3, 'L': 3, 'J': 3, 'S': 3, 'T': 3}
+
+# Shifts (dx, dy) of the bottom left corner tried in order when a rotated
+# tetromino does not fit on the game grid (wall kicks)
+KICKS = ((0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0))
+
+
+# Computes the shape of a tetromino from its tile offsets as (min_dx, max_dx,
+# rows), where min_dx and max_dx are the horizontal extents of the tiles and
+# rows is a tuple of (dy, bits) pairs giving the bitmask of the tiles on each
+# row (bit 0 = the column of min_dx)
+def compute_shape(offsets):
+    min_dx = min(dx for dx, dy in offsets)
+    max_dx = max(dx for dx, dy in offsets)
+    row_bits = {}
+    for dx, dy in offsets:
+        row_bits[dy] = row_bits.get(dy, 0) | (1 << (dx - min_dx))
+    return min_dx, max_dx, tuple(sorted(row_bits.items()))
+
+
+# Bitmask shapes of each tetromino type in each rotation
+SHAPES = {type: tuple(compute_shape(offsets) for offsets in rotations)
+          for type, rotations in ROTATIONS.items()}
+
+
+# Computes the bottom profile of a tetromino from its tile offsets as a tuple of
+# (dx, dy) pairs giving the lowest tile of each of its columns
+def compute_bottom_profile(offsets):
+    bottoms = {}
+    for dx, dy in offsets:
+        bottoms[dx] = min(dy, bottoms.get(dx, dy))
+    return tuple(sorted(bottoms.items()))
+
+
+# Bottom profiles of each tetromino type in each rotation
+BOTTOM_PROFILES = {type: tuple(compute_bottom_profile(offsets) for offsets in rotations)
+                   for type, rotations in ROTATIONS.items()}
 
 
 class Tetromino:
 
-    rotatedBefore = 1
-    def __init__(self, type, grid_height, grid_width, is_next=False):
+    # Constructor that creates a tetromino of the given type above the game grid,
+    # rng is the random number generator used for its horizontal position and
+    # the numbers on its tiles (the random module by default)
+    def __init__(self, type, grid_height, grid_width, is_next=False, rng=random):
         self.type = type
-        self.rotatedBefore = 1
+        # index of the current rotation in ROTATIONS
+        self.rotation = 0
         # set grid_height and grid_width from input parameters
         self.grid_height = grid_height
         self.grid_width = grid_width
-        # set the shape of the tetromino based on the given type
-        self.occupied_tiles = []
-        if type == 'I':
-            n = 4  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino I in its initial orientation
-            self.occupied_tiles.append((0, 0))  # (column_index, row_index)
-            self.occupied_tiles.append((0, 1))
-            self.occupied_tiles.append((0, 2))
-            self.occupied_tiles.append((0, 3))
-        elif type == 'O':
-            n = 2  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino O in its initial orientation
-            self.occupied_tiles.append((0, 0))
-            self.occupied_tiles.append((1, 0))
-            self.occupied_tiles.append((0, 1))
-            self.occupied_tiles.append((1, 1))
-        elif type == 'Z':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            self.occupied_tiles.append((0, 0))
-            self.occupied_tiles.append((1, 0))
-            self.occupied_tiles.append((1, 1))
-            self.occupied_tiles.append((2, 1))
-        elif type == 'J':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            self.occupied_tiles.append((0, 0))
-            self.occupied_tiles.append((2, 0))
-            self.occupied_tiles.append((1, 0))
-            self.occupied_tiles.append((2, 1))
-        elif type == 'L':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            self.occupied_tiles.append((0, 0))
-            self.occupied_tiles.append((2, 0))
-            self.occupied_tiles.append((1, 0))
-            self.occupied_tiles.append((0, 1))
-        elif type == 'T':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            self.occupied_tiles.append((0, 0))
-            self.occupied_tiles.append((2, 0))
-            self.occupied_tiles.append((1, 0))
-            self.occupied_tiles.append((1, 1))
-        elif type == 'S':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            self.occupied_tiles.append((0, 1))
-            self.occupied_tiles.append((2, 0))
-            self.occupied_tiles.append((1, 0))
-            self.occupied_tiles.append((1, 1))
-            # create a matrix of numbered tiles based on the shape of the tetromino
+        # n = number of rows = number of columns in the tile matrix
+        n = MATRIX_SIZES[type]
+        # create a matrix of numbered tiles based on the shape of the tetromino
         self.tile_matrix = np.full((n, n), None)
         # initial position of the bottom-left tile in the tile matrix just before
         # the tetromino enters the game grid
@@ -74,19 +103,17 @@ class Tetromino:
         # upper side of the game grid
         self.bottom_left_corner.y = grid_height
         # a random horizontal position
-        self.bottom_left_corner.x = random.randint(0, grid_width - n)
+        self.bottom_left_corner.x = rng.randint(0, grid_width - n)
 
         # create each tile by computing its position w.r.t. the game grid based on
-        # its bottom_left_corner
-        for i in range(len(self.occupied_tiles)):
-            col_index, row_index = self.occupied_tiles[i][0], self.occupied_tiles[i][1]
-            position = Point()
-            # horizontal position of the tile
-            position.x = self.bottom_left_corner.x + col_index
-            # vertical position of the tile
-            position.y = self.bottom_left_corner.y + (n - 1) - row_index
-            # create the tile on the computed position
-            self.tile_matrix[row_index][col_index] = Tile(position)
+        # its bottom_left_corner, the tiles are also kept in a list in the order
+        # of the offsets in ROTATIONS
+        self.tiles = []
+        for dx, dy in ROTATIONS[type][0]:
+            position = Point(self.bottom_left_corner.x + dx, self.bottom_left_corner.y + dy)
+            tile = Tile(position, rng=rng)
+            self.tile_matrix[n - 1 - dy][dx] = tile
+            self.tiles.append(tile)
 
     def get_type(self):
         return cp.copy(self.type)
@@ -100,7 +127,7 @@ class Tetromino:
                 if self.tile_matrix[row][col] != None:
                     # considering newly entered tetrominoes to the game grid that may
                     # have tiles with position.y >= grid_height
-                    position = self.tile_matrix[row][col].get_position()
+                    position = self.tile_matrix[row][col].get_position_ref()
                     if position.y < self.grid_height:
                         self.tile_matrix[row][col].draw()
 
@@ -118,203 +145,32 @@ class Tetromino:
             self.bottom_left_corner.x += 1
         else:  # direction == "down"
             self.bottom_left_corner.y -= 1
-        # then moving each occupied tile in the given direction by 1
-        n = len(self.tile_matrix)  # n = number of rows = number of columns
-        for row in range(n):
-            for col in range(n):
-                if self.tile_matrix[row][col] != None:
-                    if direction == "left":
-                        self.tile_matrix[row][col].move(-1, 0)
-                    elif direction == "right":
-                        self.tile_matrix[row][col].move(1, 0)
-                    else:  # direction == "down"
-                        self.tile_matrix[row][col].move(0, -1)
+        # then moving each tile to its new position
+        self.update_tile_positions()
         return True  # successful move in the given direction
 
-    # Moves the tetromino to given x and y position,
-    # Adjusts the shift amount according to the upper left tile.
-    def move_pos(self, dx, dy):
-        # Keeps the leftmost tile position
-        pivot_point = Point()
-
-        # Check if the leftmost object is None, looks one unit left and bottom, sets the pivot point relative them
-        if self.tile_matrix[0][0] != None:
-            pivot_point.x = self.tile_matrix[0][0].get_position().x
-            pivot_point.y = self.tile_matrix[0][0].get_position().y
-        # If the lestmost object None, looks one to the bottom tile
-        elif self.tile_matrix[0][1] != None:
-            pivot_point.x = self.tile_matrix[0][1].get_position().x
-            pivot_point.y = self.tile_matrix[0][1].get_position().y
-        # If the lestmost object None, looks one to the right tile
-        else:
-            pivot_point.x = self.tile_matrix[1][0].get_position().x
-            pivot_point.y = self.tile_matrix[1][0].get_position().y
-
-        # Shifts each tile along with the pivot tile.
-        for m in self.tile_matrix:
-            for p in m:
-                if p != None:
-                    p.move(dx-pivot_point.x, dy-pivot_point.y)
-
-    # Rotates tetrominos
-    def rotateTetromino(self):
-        if self.type == "I":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][0].move(0, -1)
-                self.tile_matrix[1][0].move(1, 0)
-                self.tile_matrix[2][0].move(2, 1)
-                self.tile_matrix[3][0].move(3, 2)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][0].move(1, -2)
-                self.tile_matrix[1][0].move(0, -1)
-                self.tile_matrix[2][0].move(-1, 0)
-                self.tile_matrix[3][0].move(-2, 1)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][0].move(2, 2)
-                self.tile_matrix[1][0].move(1, 1)
-                self.tile_matrix[2][0].move(0, 0)
-                self.tile_matrix[3][0].move(-1, -1)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][0].move(-3, 1)
-                self.tile_matrix[1][0].move(-2, 0)
-                self.tile_matrix[2][0].move(-1, -1)
-                self.tile_matrix[3][0].move(0, -2)
-                self.rotatedBefore = 1
-        if self.type == "Z":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][0].move(2, 0)
-                self.tile_matrix[0][1].move(1, -1)
-                self.tile_matrix[1][2].move(-1, -1)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][0].move(0, -2)
-                self.tile_matrix[0][1].move(-1, -1)
-                self.tile_matrix[1][2].move(-1, 1)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][0].move(-2, 0)
-                self.tile_matrix[0][1].move(-1, 1)
-                self.tile_matrix[1][2].move(1, 1)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][0].move(0, 2)
-                self.tile_matrix[0][1].move(1, 1)
-                self.tile_matrix[1][2].move(1, -1)
-                self.rotatedBefore = 1
-
-        if self.type == "S":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][1].move(1, -1)
-                self.tile_matrix[0][2].move(0, -2)
-                self.tile_matrix[1][0].move(1, 1)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][1].move(-1, -1)
-                self.tile_matrix[0][2].move(-2, 0)
-                self.tile_matrix[1][0].move(1, -1)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][1].move(-1, 1)
-                self.tile_matrix[0][2].move(0, 2)
-                self.tile_matrix[1][0].move(-1, -1)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][1].move(1, 1)
-                self.tile_matrix[0][2].move(2, 0)
-                self.tile_matrix[1][0].move(-1, 1)
-                self.rotatedBefore = 1
-
-        if self.type == "O":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][0].move(1, 0)
-                self.tile_matrix[0][1].move(0, -1)
-                self.tile_matrix[1][0].move(0, 1)
-                self.tile_matrix[1][1].move(-1, 0)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][0].move(0, -1)
-                self.tile_matrix[0][1].move(-1, 0)
-                self.tile_matrix[1][0].move(1, 0)
-                self.tile_matrix[1][1].move(0, 1)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][0].move(-1, 0)
-                self.tile_matrix[0][1].move(0, 1)
-                self.tile_matrix[1][0].move(0, -1)
-                self.tile_matrix[1][1].move(1, 0)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][0].move(0, 1)
-                self.tile_matrix[0][1].move(1, 0)
-                self.tile_matrix[1][0].move(-1, 0)
-                self.tile_matrix[1][1].move(0, -1)
-                self.rotatedBefore = 1
-        if self.type == "L":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][0].move(1, -1)
-                self.tile_matrix[0][1].move(0, -2)
-                self.tile_matrix[0][2].move(-1, -3)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][0].move(-1, -1)
-                self.tile_matrix[0][1].move(-2, 0)
-                self.tile_matrix[0][2].move(-3, 1)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][0].move(-1, 1)
-                self.tile_matrix[0][1].move(0, 2)
-                self.tile_matrix[0][2].move(1, 3)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][0].move(1, 1)
-                self.tile_matrix[0][1].move(2, 0)
-                self.tile_matrix[0][2].move(3, -1)
-                self.rotatedBefore = 1
-        if self.type == "J":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][0].move(3, 1)
-                self.tile_matrix[0][1].move(2, 0)
-                self.tile_matrix[0][2].move(1, -1)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][0].move(1, -3)
-                self.tile_matrix[0][1].move(0, -2)
-                self.tile_matrix[0][2].move(-1, -1)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][0].move(-3, -1)
-                self.tile_matrix[0][1].move(-2, 0)
-                self.tile_matrix[0][2].move(-1, 1)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][0].move(-1, 3)
-                self.tile_matrix[0][1].move(0, 2)
-                self.tile_matrix[0][2].move(1, 1)
-                self.rotatedBefore = 1
-        if self.type == "T":
-            if (self.rotatedBefore == 1):
-                self.tile_matrix[0][0].move(2, 0)
-                self.tile_matrix[0][1].move(1, -1)
-                self.tile_matrix[0][2].move(0, -2)
-                self.rotatedBefore = 2
-            elif (self.rotatedBefore == 2):
-                self.tile_matrix[0][0].move(0, -2)
-                self.tile_matrix[0][1].move(-1, -1)
-                self.tile_matrix[0][2].move(-2, 0)
-                self.rotatedBefore = 3
-            elif (self.rotatedBefore == 3):
-                self.tile_matrix[0][0].move(-2, 0)
-                self.tile_matrix[0][1].move(-1, 1)
-                self.tile_matrix[0][2].move(0, 2)
-                self.rotatedBefore = 4
-            elif (self.rotatedBefore == 4):
-                self.tile_matrix[0][0].move(0, 2)
-                self.tile_matrix[0][1].move(1, 1)
-                self.tile_matrix[0][2].move(2, 0)
-                self.rotatedBefore = 1
+    # Method for updating the positions of the tiles from the bottom left corner
+    # and the offsets of the current rotation
+    def update_tile_positions(self):
+        x, y = self.bottom_left_corner.x, self.bottom_left_corner.y
+        for tile, (dx, dy) in zip(self.tiles, ROTATIONS[self.type][self.rotation]):
+            tile.position.x = x + dx
+            tile.position.y = y + dy
+
+    # Rotates the tetromino clockwise if the rotated tetromino fits on the game
+    # grid at its position or after one of the wall kicks in KICKS, returns True
+    # if the tetromino has been rotated
+    def rotateTetromino(self, game_grid):
+        rotation = (self.rotation + 1) % 4
+        shape = SHAPES[self.type][rotation]
+        for dx, dy in KICKS:
+            x, y = self.bottom_left_corner.x + dx, self.bottom_left_corner.y + dy
+            if game_grid.can_place(shape, x, y):
+                self.rotation = rotation
+                self.bottom_left_corner.x, self.bottom_left_corner.y = x, y
+                self.update_tile_positions()
+                return True
+        return False
 
     def draw_next_tet(self, curr_tet):
         n = len(self.tile_matrix)  # n = number of rows = number of columns
@@ -323,58 +179,50 @@ class Tetromino:
                 # draw each occupied tile (not equal to None) on the game grid
                 if self.tile_matrix[row][col] != None:
                     self.tile_matrix[row][col].set_number(curr_tet.tile_matrix[row][col].get_number())
+                    self.tile_matrix[row][col].set_color()
                     self.tile_matrix[row][col].draw_next()
 
 
 
 
 
-    # Method to check if the tetromino can be moved in the given direction or not
-    def can_be_moved(self, dir, game_grid):
-        n = len(self.tile_matrix)
-        if dir == "left" or dir == "right":
-            for row in range(n):
-                for col in range(n):
-                    # direction = left --> check the leftmost tile of each row
-                    if dir == "left" and self.tile_matrix[row][col] != None:
-                        leftmost = self.tile_matrix[row][col].get_position()
-
-                        if leftmost.x == 0:
-                            return False
-
-                        if leftmost.y >= self.grid_height:
-                            break
-
-                        if game_grid.is_occupied(leftmost.y, leftmost.x - 1):
-                            return False
-                        break
-                    # direction = right --> check the rightmost tile of each row
-                    elif dir == "right" and self.tile_matrix[row][n - 1 - col] != None:
-                        rightmost = self.tile_matrix[row][n - 1 - col].get_position()
-
-                        if rightmost.x == self.grid_width - 1:
-                            return False
-
-                        if rightmost.y >= self.grid_height:
-                            break
-
-                        if game_grid.is_occupied(rightmost.y, rightmost.x + 1):
-                            return False
-                        break
-
-        else:
-            for col in range(n):
-                for row in range(n - 1, -1, -1):
-                    if self.tile_matrix[row][col] != None:
-                        bottommost = self.tile_matrix[row][col].get_position()
+    # Method for getting the state of the tetromino as an immutable tuple (type,
+    # rotation, x, y, numbers of the tiles), see set_state
+    def get_state(self):
+        return (self.type, self.rotation, self.bottom_left_corner.x,
+                self.bottom_left_corner.y, tuple(tile.number for tile in self.tiles))
 
-                        if bottommost.y > self.grid_height:
-                            break
+    # Method for moving, rotating and numbering the tetromino as in the given
+    # state (see get_state) of a tetromino of the same type
+    def set_state(self, state):
+        type, self.rotation, x, y, numbers = state
+        if type != self.type:
+            raise ValueError("the state of a %s tetromino cannot be set on a %s "
+                             "tetromino" % (type, self.type))
+        self.bottom_left_corner.x, self.bottom_left_corner.y = x, y
+        for tile, number in zip(self.tiles, numbers):
+            if tile.number != number:
+                tile.set_number(number)
+                tile.set_color()
+        self.update_tile_positions()
 
-                        if bottommost.y == 0:
-                            return False
+    # Method for getting the bitmask shape (see compute_shape) of the tetromino
+    # in its current rotation
+    def get_shape(self):
+        return SHAPES[self.type][self.rotation]
 
-                        if game_grid.is_occupied(bottommost.y - 1, bottommost.x):
-                            return False
-                        break
-        return True
\ No newline at end of file
+    # Method for getting the bottom profile (see compute_bottom_profile) of the
+    # tetromino in its current rotation
+    def get_bottom_profile(self):
+        return BOTTOM_PROFILES[self.type][self.rotation]
+
+    # Method to check if the tetromino can be moved in the given direction or not
+    def can_be_moved(self, dir, game_grid):
+        x, y = self.bottom_left_corner.x, self.bottom_left_corner.y
+        if dir == "left":
+            x -= 1
+        elif dir == "right":
+            x += 1
+        else:  # dir == "down"
+            y -= 1
+        return game_grid.can_place(self.get_shape(), x, y)
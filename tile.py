@@ -1,4 +1,3 @@
-import stddraw # the stddraw module is used as a basic graphics library
 from color import Color # used for coloring the tile and the number on it
 from point import Point # used for representing the position of the tile
 import copy as cp # the copy module is used for copying tile positions
@@ -6,6 +5,53 @@ import random
 import math # math module that provides mathematical functions
 
 
+# Foreground (number) and background (tile) colors of the tiles of each number,
+# the tiles with a number after 2048 use AFTER_2048_COLORS
+TILE_COLORS = {
+   2: ((119, 110, 101), (240, 228, 220)),
+   4: ((119, 110, 101), (238, 225, 201)),
+   8: ((255, 255, 255), (243, 178, 122)),
+   16: ((255, 255, 255), (246, 150, 100)),
+   32: ((255, 255, 255), (247, 124, 95)),
+   64: ((255, 255, 255), (247, 95, 59)),
+   128: ((255, 255, 255), (237, 208, 115)),
+   256: ((255, 255, 255), (237, 204, 98)),
+   512: ((255, 255, 255), (238, 199, 82)),
+   1024: ((255, 255, 255), (238, 199, 66)),
+   2048: ((255, 255, 255), (239, 194, 46)),
+}
+AFTER_2048_COLORS = ((255, 255, 255), (60, 59, 50))
+
+# Color objects shared by all the tiles with the same number (the palette),
+# created when first needed
+_palette = {}
+
+
+# Returns the shared (foreground, background) Color objects of the given number
+def get_palette_colors(number):
+   colors = _palette.get(number)
+   if colors is None:
+      foreground, background = TILE_COLORS.get(number, AFTER_2048_COLORS)
+      colors = _palette[number] = (Color(*foreground), Color(*background))
+   return colors
+
+
+# Tiles used for drawing the numbers with draw_tile (one for each number),
+# created when first needed
+_drawn_tiles = {}
+
+
+# Draws a tile with the given number centered on (x, y) as Tile.draw does, but
+# from a tile shared by all the drawings of the number (e.g. for the cells of
+# the game grid, which are stored as numbers)
+def draw_tile(number, x, y):
+   import stddraw
+   tile = _drawn_tiles.get(number)
+   if tile is None:
+      tile = _drawn_tiles[number] = Tile(Point(0, 0), number)
+   stddraw.sprite(tile.get_sprite_key(), x, y, 0.5, tile.draw_at)
+
+
 class Tile:
    # Class attributes shared among all Tile objects
    # ---------------------------------------------------------------------------
@@ -13,19 +59,25 @@ class Tile:
    boundary_thickness = 0.004
    # font family and size used for displaying the tile number
    font_family, font_size = "Arial", 14
+   # boundary (box) color used by default
+   default_boundary_color = Color(180, 180, 180)
+   # the attributes of the tiles are stored in slots (no __dict__ per tile)
+   __slots__ = ("number", "position", "foreground_color", "background_color",
+                "boundary_color")
 
-   # Constructor that creates a tile at a given position with 2 or 4 as its number
-   def __init__(self, position = Point(0, 0)): # (0, 0) is the default position
+   # Constructor that creates a tile at a given position with the given number,
+   # or with 2 or 4 as its number (chosen with the random number generator rng)
+   # when no number is given
+   def __init__(self, position = Point(0, 0), number = None, rng = random): # (0, 0) is the default position
       rand_num = [2,4]
       # assign the number on the tile
-      self.number = random.choice(rand_num)
+      if number is None:
+         number = rng.choice(rand_num)
+      self.number = number
       # set the colors of the tile
-      self.foreground_color = Color(119, 110, 101)  # foreground (number) color
-      self.boundary_color = Color(180, 180, 180)  # boundary (box) color
-      if self.number == 2:
-         self.background_color = Color(240, 228, 220)  # background (tile) color
-      else: #self.number == 4:
-         self.background_color = Color(238, 225, 201) # background (tile) color
+      self.boundary_color = Tile.default_boundary_color  # boundary (box) color
+      # foreground (number) and background (tile) colors based on the number
+      self.set_color()
       # set the position of the tile as the given position
       self.position = Point(position.x, position.y)
 
@@ -39,78 +91,67 @@ class Tile:
       # return the position of the tile
       return cp.copy(self.position)
 
-   # Getter method for getting the value of the tile
+   # Getter method for the position of the tile without copying it (for the
+   # engine code), the returned point must not be modified
+   def get_position_ref(self):
+      return self.position
+
+   # Getter method for getting the value of the tile (numbers are immutable, so
+   # they are not copied)
    def get_number(self):
       # return the value of the tile
-      return cp.copy(self.number)
+      return self.number
 
    # Setter method for the value of the tile
    def set_number(self,number):
       # set the value of the tile as the given value
-      self.number = cp.copy(number)
+      self.number = number
 
-   # Setter method for the color of the each tile value
+   # Setter method for the color of the each tile value, the colors are shared
+   # by all the tiles with the same number
    def set_color(self):
-     if self.number == 4:
-        self.background_color = Color(238, 225, 201)
-     else:
-      self.foreground_color = Color(255, 255, 255)  # foreground (number) color
-      if self.number == 8:
-        self.background_color = Color(243, 178, 122) # background (tile) color
-      elif self.number == 16:
-        self.background_color = Color(246, 150, 100)  # background (tile) color
-      elif self.number == 32:
-        self.background_color = Color(247, 124, 95)  # background (tile) color
-      elif self.number == 64:
-        self.background_color = Color(247, 95, 59)  # background (tile) color
-      elif self.number == 128:
-        self.background_color = Color(237, 208, 115)  # background (tile) color
-      elif self.number == 256:
-        self.background_color = Color(237, 204, 98)
-      elif self.number == 512:
-        self.background_color = Color(238, 199, 82)
-      elif self.number == 1024:
-        self.background_color = Color(238, 199, 66)
-      elif self.number == 2048:
-        self.background_color = Color(239, 194, 46)
-      else: # after 2048
-        self.background_color = Color(60,59,50)
+      self.foreground_color, self.background_color = \
+         get_palette_colors(self.number)
 
    # Method for moving the tile by dx along the x axis and by dy along the y axis
    def move(self, dx, dy):
       self.position.translate(dx, dy)
 
-   # Method for drawing the tile
+   # Method for drawing the tile, the tile is rendered once for each number and
+   # colors (at the current scale) and the rendered sprite is reused afterwards
    def draw(self):
-      # draw the tile as a filled square
-      stddraw.setPenColor(self.background_color)
-      stddraw.filledSquare(self.position.x, self.position.y, 0.5)
-      # draw the bounding box of the tile as a square
-      stddraw.setPenColor(self.boundary_color)
-      stddraw.setPenRadius(Tile.boundary_thickness)
-      stddraw.square(self.position.x, self.position.y, 0.5)
-      stddraw.setPenRadius()  # reset the pen radius to its default value
-      # draw the number on the tile
-      stddraw.setPenColor(self.foreground_color)
-      stddraw.setFontFamily(Tile.font_family)
-      stddraw.setFontSize(Tile.font_size)
-      stddraw.boldText(self.position.x, self.position.y, str(self.number))
+      # stddraw is imported only when drawing so that tiles can be used headless
+      import stddraw
+      stddraw.sprite(self.get_sprite_key(), self.position.x, self.position.y, 0.5,
+                     self.draw_at)
 
    # Method for drawing next tetromino's tiles
    def draw_next(self):
+      import stddraw
+      stddraw.sprite(self.get_sprite_key(), self.position.x+12.2, self.position.y-10, 0.5,
+                     self.draw_at)
+
+   # Method for getting the key that identifies how the tile looks
+   def get_sprite_key(self):
+      return (self.number, self.background_color, self.foreground_color,
+              self.boundary_color)
+
+   # Method for drawing the tile centered on (x, y) without using the sprite cache
+   def draw_at(self, x, y):
+      import stddraw
       # draw the tile as a filled square
       stddraw.setPenColor(self.background_color)
-      stddraw.filledSquare(self.position.x+12.2, self.position.y-10, 0.5)
+      stddraw.filledSquare(x, y, 0.5)
       # draw the bounding box of the tile as a square
       stddraw.setPenColor(self.boundary_color)
       stddraw.setPenRadius(Tile.boundary_thickness)
-      stddraw.square(self.position.x+12.2, self.position.y-10, 0.5)
+      stddraw.square(x, y, 0.5)
       stddraw.setPenRadius()  # reset the pen radius to its default value
       # draw the number on the tile
       stddraw.setPenColor(self.foreground_color)
       stddraw.setFontFamily(Tile.font_family)
       stddraw.setFontSize(Tile.font_size)
-      stddraw.boldText(self.position.x+12.2, self.position.y-10, str(self.number))
+      stddraw.boldText(x, y, str(self.number))
 
    def canBeMoved(self, moving_position):
        grid_h, grid_w = 20, 12
@@ -0,0 +1,244 @@
+import argparse  # used for parsing the command-line arguments
+import importlib  # used for loading the agents given as module:function
+import json  # used for streaming the results as JSON lines
+import os  # used for counting the cores
+import random  # used for the seeds of the games and the random agent
+import sys
+import time  # used for timing the games
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from engine import GameEngine  # runs the game rules (headless)
+from replay import start_recording, board_hash  # used for the replays
+from autoplay import beam_agent  # the beam search agent
+
+# Runs a tournament between agents that play Tetris 2048 headless: each agent
+# plays the same N games (the i-th game of every agent uses the same seed) on a
+# pool of processes, the result of each game is printed (and optionally written
+# to a file) as soon as it finishes, and a summary of each agent is printed at
+# the end. Example:
+#
+#    python tournament.py --agents random,idle --games 100 --seed 1
+
+
+# An agent is created by a function (an agent factory) called with the seed of
+# the game, which returns the function that chooses the action to apply in each
+# step given the game engine (see GameEngine.run)
+
+# Agent factory for an agent that never moves the tetrominoes
+def idle_agent(seed):
+    return lambda engine: None
+
+
+# Agent factory for an agent that applies random actions
+def random_agent(seed):
+    rng = random.Random(seed)
+    actions = (None,) + GameEngine.actions
+    return lambda engine: rng.choice(actions)
+
+
+# Agents that can be given by their names on the command line, other agents can
+# be given as module:function where function is an agent factory
+AGENTS = {"idle": idle_agent, "random": random_agent, "beam": beam_agent}
+
+
+# Returns the agent factory with the given name or module:function
+def load_agent(name):
+    if name in AGENTS:
+        return AGENTS[name]
+    if ":" not in name:
+        raise ValueError("unknown agent: " + name)
+    module_name, function_name = name.split(":", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# Returns the seeds of the given number of games derived from the base seed, so
+# that the same base seed always gives the same games
+def game_seeds(base_seed, n_games):
+    rng = random.Random(base_seed)
+    return [rng.getrandbits(32) for i in range(n_games)]
+
+
+# Plays a single game with the given agent and seed in the current process and
+# returns its result as a dictionary, an error raised by the agent or by the game
+# is returned in the result instead of being raised. The replay of the game is
+# saved in replay_dir when it is given.
+def play_game(agent_name, game, seed, grid_h=20, grid_w=12, max_steps=None,
+              replay_dir=None):
+    result = {"agent": agent_name, "game": game, "seed": seed}
+    start_time = time.perf_counter()
+    try:
+        choose_action = load_agent(agent_name)(seed)
+        engine = GameEngine(grid_h, grid_w, seed=seed)
+        recorder = start_recording(engine) if replay_dir is not None else None
+        engine.run(choose_action, max_steps)
+        result.update(score=engine.score, max_tile=engine.max_tile,
+                      pieces=engine.pieces_placed, game_over=engine.game_over,
+                      board_hash=board_hash(engine))
+        if recorder is not None:
+            agent_file_name = "".join(c if c.isalnum() else "_" for c in agent_name)
+            result["replay"] = os.path.join(
+                replay_dir, "%s_%d_%d.replay" % (agent_file_name, game, seed))
+            recorder.save(result["replay"])
+    except Exception as error:
+        result["error"] = "%s: %s" % (type(error).__name__, error)
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+# Plays n_games games with each agent on a pool of workers processes and returns
+# the results, on_result is called with each result as soon as its game is over.
+# Only a few games per worker are given to the pool at a time, so when a worker
+# process crashes only the games in progress are lost: they are played again one
+# by one in a process of their own (up to max_retries times, after which they
+# are reported with an error) and the other games go on in a new pool.
+def run_tournament(agent_names, n_games, base_seed=0, workers=None, grid_h=20,
+                   grid_w=12, max_steps=None, max_retries=2, on_result=None,
+                   replay_dir=None):
+    workers = workers or os.cpu_count() or 1
+    seeds = game_seeds(base_seed, n_games)
+    queue = [(agent_name, game, seeds[game]) for game in range(n_games)
+             for agent_name in agent_names]
+    queue.reverse()  # the games are taken from the end of the queue
+    results = []
+
+    def report(result):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    def submit(executor, game_args):
+        return executor.submit(play_game, *game_args, grid_h=grid_h, grid_w=grid_w,
+                               max_steps=max_steps, replay_dir=replay_dir)
+
+    while queue:
+        lost = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            try:
+                while queue or running:
+                    while queue and len(running) < 2 * workers:
+                        # the game is taken from the queue only once it has been
+                        # submitted, so it is not lost if the pool is broken
+                        future = submit(executor, queue[-1])
+                        running[future] = queue.pop()
+                    done, not_done = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        game_args = running.pop(future)
+                        try:
+                            report(future.result())
+                        except BrokenProcessPool:
+                            lost.append(game_args)
+                    if lost:
+                        # the pool cannot be used anymore
+                        lost.extend(running.values())
+                        break
+            except BrokenProcessPool:
+                lost.extend(running.values())
+        # play each lost game alone to find the ones that crash their worker
+        for agent_name, game, seed in lost:
+            for attempt in range(max_retries + 1):
+                try:
+                    with ProcessPoolExecutor(max_workers=1) as executor:
+                        report(submit(executor, (agent_name, game, seed)).result())
+                    break
+                except BrokenProcessPool:
+                    pass
+            else:
+                report({"agent": agent_name, "game": game, "seed": seed,
+                        "error": "worker process crashed"})
+    return results
+
+
+# Returns the summary of the results of each agent: the number of games played
+# and failed, the mean and the best score, the largest tile, the mean number of
+# pieces placed and the games played per second by a single worker
+def summarize(results):
+    summary = {}
+    for result in results:
+        stats = summary.setdefault(result["agent"], {
+            "games": 0, "errors": 0, "mean_score": 0.0, "best_score": 0,
+            "max_tile": 0, "mean_pieces": 0.0, "seconds": 0.0})
+        if "error" in result:
+            stats["errors"] += 1
+            continue
+        stats["games"] += 1
+        stats["mean_score"] += result["score"]
+        stats["best_score"] = max(stats["best_score"], result["score"])
+        stats["max_tile"] = max(stats["max_tile"], result["max_tile"])
+        stats["mean_pieces"] += result["pieces"]
+        stats["seconds"] += result["seconds"]
+    for stats in summary.values():
+        if stats["games"] > 0:
+            stats["mean_score"] /= stats["games"]
+            stats["mean_pieces"] /= stats["games"]
+        seconds = stats.pop("seconds")
+        stats["games_per_second"] = stats["games"] / seconds if seconds > 0 else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a Tetris 2048 tournament between agents.")
+    parser.add_argument("--agents", default="random,idle",
+                        help="comma-separated agent names or module:function "
+                             "agent factories (built-in: %s)" % ", ".join(AGENTS))
+    parser.add_argument("--games", type=int, default=100,
+                        help="number of games played by each agent")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="base seed the seeds of the games are derived from")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--max-steps", type=int, default=None,
+                        help="maximum number of steps of a game")
+    parser.add_argument("--grid", type=int, nargs=2, default=(20, 12),
+                        metavar=("HEIGHT", "WIDTH"), help="size of the game grid")
+    parser.add_argument("--output", default=None,
+                        help="file the result of each game is appended to as a "
+                             "JSON line as soon as the game is over")
+    parser.add_argument("--replays", default=None, metavar="DIR",
+                        help="directory the replays of the games are saved in")
+    args = parser.parse_args(argv)
+    agent_names = [name for name in args.agents.split(",") if name]
+    # check the agents before starting the workers
+    for name in agent_names:
+        load_agent(name)
+
+    if args.replays is not None:
+        os.makedirs(args.replays, exist_ok=True)
+    output = open(args.output, "a") if args.output else None
+
+    def on_result(result):
+        line = json.dumps(result)
+        print(line, flush=True)
+        if output is not None:
+            output.write(line + "\n")
+            output.flush()
+
+    start_time = time.perf_counter()
+    try:
+        results = run_tournament(agent_names, args.games, args.seed, args.workers,
+                                 args.grid[0], args.grid[1], args.max_steps,
+                                 on_result=on_result, replay_dir=args.replays)
+    finally:
+        if output is not None:
+            output.close()
+    elapsed = time.perf_counter() - start_time
+
+    summary = summarize(results)
+    print("%-20s %6s %6s %10s %10s %8s %8s %8s" % (
+        "agent", "games", "errors", "mean score", "best score", "max tile",
+        "pieces", "games/s"), file=sys.stderr)
+    for agent_name in agent_names:
+        stats = summary.get(agent_name)
+        if stats is None:
+            continue
+        print("%-20s %6d %6d %10.1f %10d %8d %8.1f %8.2f" % (
+            agent_name, stats["games"], stats["errors"], stats["mean_score"],
+            stats["best_score"], stats["max_tile"], stats["mean_pieces"],
+            stats["games_per_second"]), file=sys.stderr)
+    print("%d games in %.1f s (%.2f games/s)" % (
+        len(results), elapsed, len(results) / elapsed), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse  # used for parsing the command-line arguments
+import json  # used for reading the results and printing the verifications
+import os  # used for counting the cores
+import sys
+import time  # used for measuring the verification speed
+from concurrent.futures import ProcessPoolExecutor
+from replay import load_replay, verify_replay  # plays the replays headless
+
+# Verifies recorded games by playing their replays headless as fast as possible
+# on a pool of processes and checking their final scores and board hashes. The
+# games to verify are given as replay files (optionally with the expected score
+# and board hash when a single replay is given) or as JSON lines files of
+# results with "replay", "score" and "board_hash" keys, such as the ones written
+# by tournament.py. Examples:
+#
+#    python verify_replays.py results.jsonl
+#    python verify_replays.py game.replay --score 1024 --board-hash 0123abcd...
+
+
+# Loads and verifies a single replay, returns the result of the verification
+# with the expected values of the claim. Any error raised by a bad replay is
+# returned as a failed verification, so it does not stop the other ones.
+def verify_claim(claim):
+    result = {"replay": claim["replay"], "expected_score": claim.get("score"),
+              "expected_board_hash": claim.get("board_hash")}
+    try:
+        result.update(verify_replay(load_replay(claim["replay"]),
+                                    claim.get("score"), claim.get("board_hash")))
+    except Exception as error:
+        result.update(ok=False, error="%s: %s" % (type(error).__name__, error))
+    return result
+
+
+# Reads the claims to verify from the given files, each claim is a dictionary
+# with the path of a replay and optionally the expected score and board hash
+def read_claims(paths):
+    claims = []
+    for path in paths:
+        if not path.endswith(".jsonl"):
+            claims.append({"replay": path})
+            continue
+        with open(path) as file:
+            for line in file:
+                result = json.loads(line)
+                if "replay" in result:
+                    claims.append({"replay": result["replay"],
+                                   "score": result.get("score"),
+                                   "board_hash": result.get("board_hash")})
+    return claims
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Verify the scores and the boards of recorded games.")
+    parser.add_argument("paths", nargs="+",
+                        help="replay files or JSON lines files of results")
+    parser.add_argument("--score", type=int, default=None,
+                        help="expected score (for a single replay)")
+    parser.add_argument("--board-hash", default=None,
+                        help="expected board hash (for a single replay)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    claims = read_claims(args.paths)
+    if args.score is not None or args.board_hash is not None:
+        if len(claims) != 1:
+            parser.error("--score and --board-hash need a single replay")
+        claims[0].update(score=args.score, board_hash=args.board_hash)
+
+    start_time = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(verify_claim, claims, chunksize=16):
+            failed += not result["ok"]
+            print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - start_time
+    print("%d replays verified in %.1f s (%.1f replays/s), %d failed" % (
+        len(claims), elapsed, len(claims) / elapsed if elapsed > 0 else 0.0,
+        failed), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
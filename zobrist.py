@@ -0,0 +1,127 @@
+from collections import OrderedDict  # least recently used key tables
+import numpy as np  # fundamental Python module for scientific computing
+
+# Zobrist hashing of boards stored as arrays of tile exponents (see
+# grid_kernels.py): a random 64-bit key is drawn once for each (row, col, tile
+# exponent) and the hash of a board is the XOR of the keys of its tiles (the key
+# of an empty cell is 0, so the empty board hashes to 0). When some cells change
+# the hash is updated by XORing out their old keys and XORing in their new keys,
+# without hashing the whole board again. The keys are drawn from a fixed seed,
+# so the hash of a board is the same in every process and every run.
+# The keys are drawn in blocks of KEY_BLOCK exponents (each block from its own
+# seed, so a key does not depend on how many blocks have been drawn) and a block
+# is drawn only when a board has a tile exponent in it, the tiles of a game
+# rarely go past 2 ** 31. The key tables of the last MAX_KEY_TABLES grid sizes
+# used are kept.
+
+# seed of the random number generator the keys are drawn from
+ZOBRIST_SEED = 2048
+# number of exponents in each block of keys
+KEY_BLOCK = 32
+# number of grid sizes whose key tables are kept
+MAX_KEY_TABLES = 4
+
+# keys of the last grid sizes used, the least recently used first
+_keys = OrderedDict()
+
+
+# Returns the keys of the boards of the given size as an array of shape
+# (height, width, n) of uint64 with n >= n_exponents (a multiple of KEY_BLOCK)
+def zobrist_keys(height, width, n_exponents=KEY_BLOCK):
+    keys = _keys.get((height, width))
+    if keys is None or keys.shape[2] < n_exponents:
+        blocks = [] if keys is None else [keys]
+        for block in range(0 if keys is None else keys.shape[2] // KEY_BLOCK,
+                           -(-n_exponents // KEY_BLOCK)):
+            rng = np.random.default_rng((ZOBRIST_SEED, height, width, block))
+            blocks.append(rng.integers(0, 2 ** 64, (height, width, KEY_BLOCK),
+                                       dtype=np.uint64, endpoint=False))
+        keys = np.concatenate(blocks, axis=2)
+        keys[:, :, 0] = 0
+        _keys[(height, width)] = keys
+        if len(_keys) > MAX_KEY_TABLES:
+            _keys.popitem(last=False)
+    _keys.move_to_end((height, width))
+    return keys
+
+
+# Returns the key of the given tile exponent at the given cell of a board of the
+# given size (0 for an empty cell)
+def zobrist_key(height, width, row, col, exponent):
+    return int(zobrist_keys(height, width, exponent + 1)[row, col, exponent])
+
+
+# Returns the Zobrist hash of a board (an int)
+def zobrist_hash(values):
+    height, width = values.shape
+    rows, cols = np.nonzero(values)
+    if len(rows) == 0:
+        return 0
+    exponents = values[rows, cols]
+    keys = zobrist_keys(height, width, int(exponents.max()) + 1)
+    return int(np.bitwise_xor.reduce(keys[rows, cols, exponents]))
+
+
+# Returns the hash of the board new_values given the hash of the board
+# old_values of the same size, only the cells that differ are hashed
+def update_zobrist_hash(board_hash, old_values, new_values):
+    height, width = old_values.shape
+    rows, cols = np.nonzero(old_values != new_values)
+    if len(rows) == 0:
+        return board_hash
+    old, new = old_values[rows, cols], new_values[rows, cols]
+    keys = zobrist_keys(height, width, int(max(old.max(), new.max())) + 1)
+    changed = np.bitwise_xor.reduce(keys[rows, cols, old]) ^ \
+        np.bitwise_xor.reduce(keys[rows, cols, new])
+    return board_hash ^ int(changed)
+
+
+# Class used for remembering the positions met during a search, keyed by the
+# Zobrist hash of their boards, in a bounded number of slots: an entry is stored
+# in the slot given by its key and replaces the entry already there only if that
+# entry has the same key or is older (from an earlier search or for an earlier
+# piece), so the table never grows and the entries of the current search are
+# kept until the next one
+class TranspositionTable:
+    # Constructor that creates a table with the given number of slots
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.keys = [None] * size
+        # (search, piece, value) of the entry in each slot
+        self.entries = [None] * size
+        # number of lookups that found their key, and of stores that replaced
+        # an entry with another key
+        self.hits = 0
+        self.lookups = 0
+        self.replacements = 0
+
+    # Method for getting the (search, piece, value) entry stored for the given
+    # key, or None when the key is not in the table
+    def get(self, key):
+        self.lookups += 1
+        slot = key % self.size
+        if self.keys[slot] != key:
+            return None
+        self.hits += 1
+        return self.entries[slot]
+
+    # Method for storing an entry for the given key, search identifies the search
+    # the entry comes from (e.g. a counter) and piece the number of pieces placed
+    # in the position, returns False when the slot has been kept for a newer
+    # entry with another key
+    def store(self, key, search, piece, value):
+        slot = key % self.size
+        stored_key = self.keys[slot]
+        if stored_key is not None and stored_key != key:
+            stored_search, stored_piece, stored_value = self.entries[slot]
+            if (stored_search, stored_piece) >= (search, piece):
+                return False
+            self.replacements += 1
+        self.keys[slot] = key
+        self.entries[slot] = (search, piece, value)
+        return True
+
+    # Method for removing all the entries
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size